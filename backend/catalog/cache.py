@@ -0,0 +1,187 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.dispatch import Signal
+
+from .models import Product
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_MODIFIED_KEY = "catalog:modified"
+AVAILABILITY_KEY = "catalog:availability:{}"
+# Short on purpose: stock moves with every paid order
+AVAILABILITY_TTL = 5
+
+# Sent after cached catalog responses were invalidated (with the `tags`).
+catalog_invalidated = Signal()
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def read_counter(key: str) -> int:
+    """
+    Current value of a version counter kept in the default cache.
+
+    Counters are initialised lazily with a millisecond timestamp (e.g. after
+    a restart with a cold cache), so a fresh value does not collide with one
+    handed out before the restart.
+    With several processes, configure a shared cache backend (see `CACHES`).
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _now_ms(), timeout=None)
+        version = cache.get(key) or _now_ms()
+    return version
+
+
+def bump_counter(key: str) -> int:
+    """
+    Increment a version counter. The bump is an atomic `incr`, so concurrent
+    bumps (from several threads or processes) always hand out distinct values.
+    """
+    cache.add(key, _now_ms(), timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.add(key, _now_ms(), timeout=None)
+        return cache.incr(key)
+
+
+def get_catalog_version() -> int:
+    """Return the current catalog version."""
+    return read_counter(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> int:
+    """Mark the catalog as changed; called on every Category/Product write."""
+    version = bump_counter(CATALOG_VERSION_KEY)
+    cache.set(CATALOG_MODIFIED_KEY, _now_ms(), timeout=None)
+    return version
+
+
+def catalog_last_modified() -> datetime:
+    # The version is a counter seeded with a timestamp; the time of the last
+    # change is kept next to it.
+    modified = cache.get(CATALOG_MODIFIED_KEY) or get_catalog_version()
+    return datetime.fromtimestamp(modified / 1000, tz=timezone.utc)
+
+
+class CatalogSnapshotCache:
+    """
+    In-process store of pre-rendered catalog response bodies.
+
+    Each entry is tagged (e.g. "products", "product:<slug>", "category:<id>")
+    so a write only drops the entries that embed the changed object.
+    Writes made by another process are noticed through the shared catalog
+    version, in which case the whole store is dropped.
+    At most `max_entries` bodies are kept; further misses are rendered
+    without being stored.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: dict[str, bytes] = {}
+        self._tags: dict[str, frozenset[str]] = {}
+        self._generation = 0
+        self._seen_version = None
+
+    def _sync_version(self) -> None:
+        version = get_catalog_version()
+        if version != self._seen_version:
+            with self._lock:
+                self._entries.clear()
+                self._tags.clear()
+                self._generation += 1
+                self._seen_version = version
+
+    def get_or_build(self, key: str, build, tags=()) -> bytes:
+        """Return the cached body for `key`, rendering it with `build()` on a miss."""
+        self._sync_version()
+        body = self._entries.get(key)
+        if body is not None:
+            return body
+
+        generation = self._generation
+        body = build()
+        with self._lock:
+            # Skip storing if an invalidation ran while we were rendering.
+            if generation == self._generation and len(self._entries) < self.max_entries:
+                self._entries[key] = body
+                self._tags[key] = frozenset(tags) | {key}
+        return body
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop entries carrying any of `tags` (everything when no tag is given)."""
+        with self._lock:
+            previous = self._seen_version
+            version = bump_catalog_version()
+            if tags and previous is not None and version == previous + 1:
+                wanted = set(tags)
+                stale = [key for key, key_tags in self._tags.items() if key_tags & wanted]
+            else:
+                # Another process changed the catalog since our last sync: the
+                # entries it invalidated are unknown here, drop everything.
+                stale = list(self._entries)
+            for key in stale:
+                self._entries.pop(key, None)
+                self._tags.pop(key, None)
+            self._generation += 1
+            self._seen_version = version
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+snapshot_cache = CatalogSnapshotCache()
+
+
+def invalidate_catalog(*tags: str) -> None:
+    """Invalidate cached catalog responses and bump the catalog version."""
+    snapshot_cache.invalidate(*tags)
+    catalog_invalidated.send(sender=CatalogSnapshotCache, tags=tags)
+
+
+def get_availability(product_ids) -> dict[int, dict]:
+    """
+    {id: {"stock": int, "is_active": bool}} for the given product ids.
+    Served from the default cache for up to AVAILABILITY_TTL seconds; the
+    misses are loaded with a single primary-key query. Unknown ids are omitted.
+    """
+    keys = {AVAILABILITY_KEY.format(pk): pk for pk in product_ids}
+    cached = cache.get_many(keys)
+    result = {keys[key]: value for key, value in cached.items()}
+
+    missing = [pk for key, pk in keys.items() if key not in cached]
+    if missing:
+        rows = Product.objects.filter(pk__in=missing).order_by().values_list("pk", "stock", "is_active")
+        fresh = {pk: {"stock": stock, "is_active": is_active} for pk, stock, is_active in rows}
+        cache.set_many(
+            {AVAILABILITY_KEY.format(pk): value for pk, value in fresh.items()}, AVAILABILITY_TTL
+        )
+        result.update(fresh)
+    return result
+
+
+def invalidate_availability(product_ids) -> None:
+    cache.delete_many([AVAILABILITY_KEY.format(pk) for pk in product_ids])
+
+
+def invalidate_stock(product_ids) -> None:
+    """
+    Drop cached catalog responses and availability after stock was changed
+    with queryset updates (F() expressions), which bypass the Product signals.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    slugs = Product.objects.filter(pk__in=product_ids).values_list("slug", flat=True)
+    invalidate_catalog("categories", "products", *(f"product:{slug}" for slug in slugs))
+    invalidate_availability(product_ids)
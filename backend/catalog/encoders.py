@@ -0,0 +1,86 @@
+"""
+Fast JSON encoding of catalog payloads.
+
+Builds the same bytes as `ProductSerializer` / `CategorySerializer` rendered
+by DRF's `JSONRenderer`, but straight from `.values()` rows: no model
+instances, no per-field serializer dispatch. Keep the field lists in sync
+with `catalog/serializers.py` (the `bench_catalog_serialization` command
+checks that both paths still produce identical output).
+"""
+import decimal
+import json
+
+from .images import srcset_map
+from .models import Product
+
+CATEGORY_FIELDS = ("id", "name", "slug", "description", "is_active")
+CATEGORY_STATS_FIELDS = ("product_count", "in_stock_count", "min_price", "max_price")
+PRODUCT_FIELDS = (
+    "id", "name", "slug", "description", "price", "stock", "is_active", "image_url", "image_variants",
+)
+PRODUCT_VALUE_FIELDS = PRODUCT_FIELDS + tuple(f"category__{field}" for field in CATEGORY_FIELDS)
+
+_PRICE_FIELD = Product._meta.get_field("price")
+_PRICE_EXPONENT = decimal.Decimal(".1") ** _PRICE_FIELD.decimal_places
+_PRICE_CONTEXT = decimal.Context(prec=_PRICE_FIELD.max_digits)
+
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def format_price(value) -> str | None:
+    """Same string as DRF's DecimalField(max_digits=10, decimal_places=2)."""
+    if value is None:
+        return None
+    if not isinstance(value, decimal.Decimal):
+        value = decimal.Decimal(str(value).strip())
+    return "{:f}".format(value.quantize(_PRICE_EXPONENT, context=_PRICE_CONTEXT))
+
+
+def render_json(data) -> bytes:
+    # JSONRenderer escapes these two separators for JavaScript compatibility
+    text = _encoder.encode(data).replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+    return text.encode("utf-8")
+
+
+def product_dict(row: tuple, categories: dict | None = None) -> dict:
+    """Build the ProductSerializer dict from a `values_list(*PRODUCT_VALUE_FIELDS)` row."""
+    (pk, name, slug, description, price, stock, is_active, image_url, image_variants, *category_row) = row
+    category = None
+    if categories is not None:
+        category = categories.get(category_row[0])
+    if category is None:
+        category = dict(zip(CATEGORY_FIELDS, category_row))
+        if categories is not None:
+            categories[category_row[0]] = category
+    return {
+        "id": pk,
+        "name": name,
+        "slug": slug,
+        "description": description,
+        "price": format_price(price),
+        "stock": stock,
+        "is_active": is_active,
+        "image_url": image_url,
+        "image_srcset": srcset_map(image_variants),
+        "category": category,
+    }
+
+
+def product_rows(queryset):
+    return queryset.values_list(*PRODUCT_VALUE_FIELDS)
+
+
+def encode_products(queryset) -> bytes:
+    """JSON array of products, identical to ProductSerializer(many=True)."""
+    # Products of the same category share one (read-only) category dict
+    categories = {}
+    return render_json([product_dict(row, categories) for row in product_rows(queryset)])
+
+
+def encode_categories_with_stats(queryset) -> bytes:
+    """Identical to CategoryWithStatsSerializer(many=True) over `with_product_stats()`."""
+    rows = list(queryset.values(*CATEGORY_FIELDS, *CATEGORY_STATS_FIELDS))
+    for row in rows:
+        row["min_price"] = format_price(row["min_price"])
+        row["max_price"] = format_price(row["max_price"])
+    return render_json(rows)
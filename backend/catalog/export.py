@@ -0,0 +1,160 @@
+"""
+Static catalog snapshot: the catalog API payloads written as JSON files,
+plus gzip/brotli pre-compressed copies and a manifest of content hashes,
+so a CDN or the frontend (ISR) can serve the catalog without Django.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+
+from .cache import catalog_invalidated, get_catalog_version
+from .encoders import encode_categories_with_stats, encode_products, product_dict, product_rows, render_json
+from .models import Category, Product
+
+try:
+    import brotli  # type: ignore
+except Exception:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def catalog_documents() -> dict[str, bytes]:
+    """Relative path -> JSON body, mirroring the /api/catalog/ endpoints."""
+    products = Product.objects.filter(is_active=True).select_related("category")
+    categories = Category.objects.filter(is_active=True)
+
+    documents = {
+        "categories.json": encode_categories_with_stats(categories.with_product_stats()),
+        "products.json": encode_products(products),
+    }
+    for slug in categories.values_list("slug", flat=True):
+        documents[f"products/category/{slug}.json"] = encode_products(products.filter(category__slug=slug))
+    shared_categories = {}
+    for row in product_rows(products):
+        product = product_dict(row, shared_categories)
+        documents[f"products/{product['slug']}.json"] = render_json(product)
+    return documents
+
+
+def _manifest_paths(output_dir: Path, manifest: dict) -> set[Path]:
+    """Files a manifest lists (documents and their compressed siblings)."""
+    root = output_dir.resolve()
+    paths = set()
+    for relative, entry in (manifest.get("files") or {}).items():
+        path = (output_dir / relative).resolve()
+        # Only ever touch files inside the export directory
+        if not path.is_relative_to(root) or path == root:
+            continue
+        paths.add(path)
+        for suffix in ("gz", "br"):
+            if f"{suffix}_bytes" in entry:
+                paths.add(path.with_name(f"{path.name}.{suffix}"))
+    return paths
+
+
+def _read_manifest(path: Path) -> dict:
+    try:
+        manifest = json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def export_catalog(output_dir) -> dict:
+    """
+    Write every catalog document (with .gz and .br siblings) under
+    `output_dir`, remove the files of the previous export that are gone
+    (products/categories that disappeared) and return the manifest (also
+    written as manifest.json, last). Files not listed in the previous
+    manifest are never deleted.
+    """
+    if not str(output_dir).strip():
+        raise ValueError("The catalog export directory must be set (CATALOG_EXPORT_DIR).")
+    output_dir = Path(output_dir)
+    version = get_catalog_version()
+    manifest_path = output_dir / MANIFEST_NAME
+    previous = _read_manifest(manifest_path)
+    files = {}
+    written = set()
+
+    for relative, body in catalog_documents().items():
+        path = output_dir / relative
+        entry = {"sha256": hashlib.sha256(body).hexdigest(), "bytes": len(body)}
+        variants = {path: body, path.with_name(path.name + ".gz"): gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            variants[path.with_name(path.name + ".br")] = brotli.compress(body, quality=11)
+        for variant_path, data in variants.items():
+            if variant_path != path:
+                entry[f"{variant_path.suffix.lstrip('.')}_bytes"] = len(data)
+            # Unchanged files keep their mtime (cheaper CDN/rsync sync)
+            if not (variant_path.exists() and variant_path.read_bytes() == data):
+                _write_atomic(variant_path, data)
+            written.add(variant_path.resolve())
+        files[relative] = entry
+
+    for stale in _manifest_paths(output_dir, previous) - written:
+        stale.unlink(missing_ok=True)
+
+    manifest = {
+        "version": version,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "files": files,
+    }
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+class _DebouncedExport:
+    """Run one export a few seconds after the last catalog change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def schedule(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(settings.CATALOG_EXPORT_DELAY, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self) -> None:
+        with self._lock:
+            self._timer = None
+        close_old_connections()
+        try:
+            export_catalog(settings.CATALOG_EXPORT_DIR)
+            logger.info("Catalog snapshot exported to %s", settings.CATALOG_EXPORT_DIR)
+        except Exception:
+            logger.exception("Catalog snapshot export failed")
+        finally:
+            close_old_connections()
+
+
+_debounced_export = _DebouncedExport()
+
+
+@receiver(catalog_invalidated)
+def export_after_change(sender, **kwargs):
+    if settings.CATALOG_EXPORT_ON_CHANGE:
+        transaction.on_commit(_debounced_export.schedule)
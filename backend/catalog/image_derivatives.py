@@ -0,0 +1,66 @@
+"""
+Resized product image derivatives (WebP + JPEG at several widths).
+
+This module only depends on Pillow and the standard library: it runs inside
+the image worker processes, which do not set up Django.
+"""
+import io
+import os
+import urllib.request
+
+from PIL import Image, ImageOps
+
+FORMATS = {
+    # format: (Pillow format name, file extension, save options)
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+DOWNLOAD_TIMEOUT = 15
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+
+
+def _open_source(source: str) -> Image.Image:
+    if source.startswith(("http://", "https://")):
+        request = urllib.request.Request(source, headers={"User-Agent": "noor-patisserie-images"})
+        with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+            data = response.read(MAX_DOWNLOAD_BYTES + 1)
+        if len(data) > MAX_DOWNLOAD_BYTES:
+            raise ValueError(f"Image too large: {source}")
+        image = Image.open(io.BytesIO(data))
+    else:
+        image = Image.open(source)
+    image.load()
+    # Respect camera orientation and flatten transparency for JPEG
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    return image
+
+
+def render_derivatives(source: str, output_dir: str, relative_dir: str, widths: list[int]) -> dict:
+    """
+    Write one file per (format, width) under `output_dir` and return
+    {"webp": {"320": "<relative_dir>/320.webp", ...}, "jpeg": {...}}.
+
+    Widths larger than the original are skipped (no upscaling); an image
+    narrower than every requested width gets a single re-encoded copy.
+    """
+    image = _open_source(source)
+    targets = sorted({w for w in widths if w < image.width}) or [image.width]
+    if image.width <= max(widths) and image.width not in targets:
+        targets.append(image.width)
+
+    os.makedirs(output_dir, exist_ok=True)
+    variants = {name: {} for name in FORMATS}
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for name, (pil_format, extension, options) in FORMATS.items():
+            filename = f"{width}.{extension}"
+            tmp_path = os.path.join(output_dir, f".{filename}.tmp")
+            resized.save(tmp_path, pil_format, **options)
+            os.replace(tmp_path, os.path.join(output_dir, filename))
+            variants[name][str(width)] = f"{relative_dir}/{filename}"
+    return variants
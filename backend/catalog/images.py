@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from .cache import invalidate_catalog
+from .image_derivatives import render_derivatives
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "products/derivatives"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def image_source(product: Product) -> str | None:
+    """
+    Path or URL the derivatives are generated from: the uploaded `image`
+    first, then `image_url` (remote URL, or a file of the frontend `public/`
+    directory such as "/catalog/charlotte.png").
+    """
+    if product.image:
+        return product.image.path
+    url = (product.image_url or "").strip()
+    if url.startswith(("http://", "https://")):
+        return url
+    if url.startswith("/"):
+        path = os.path.join(settings.CATALOG_PUBLIC_DIR, url.lstrip("/"))
+        return path if os.path.isfile(path) else None
+    return None
+
+
+def source_key(source: str) -> str:
+    # Derivatives of a new image get new paths, so caches never serve old bytes.
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+
+def srcset_map(variants: dict) -> dict:
+    """{"webp": "<url> 320w, <url> 640w", "jpeg": ...} for the serializers."""
+    srcset = {}
+    for name in ("webp", "jpeg"):
+        files = (variants or {}).get(name) or {}
+        if files:
+            srcset[name] = ", ".join(
+                f"{default_storage.url(path)} {width}w"
+                for width, path in sorted(files.items(), key=lambda item: int(item[0]))
+            )
+    return srcset
+
+
+def needs_derivatives(product: Product) -> bool:
+    source = image_source(product)
+    current = (product.image_variants or {}).get("source")
+    return (source_key(source) if source else None) != current
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # "spawn": forking a threaded server process is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.CATALOG_IMAGE_WORKERS, mp_context=get_context("spawn")
+            )
+        return _executor
+
+
+def derivative_job(product: Product):
+    """(source key, render_derivatives() arguments) for `product`, or None without image."""
+    source = image_source(product)
+    if source is None:
+        return None
+    key = source_key(source)
+    relative_dir = f"{DERIVATIVES_DIR}/{product.pk}/{key}"
+    return key, (
+        source,
+        os.path.join(settings.MEDIA_ROOT, relative_dir),
+        relative_dir,
+        list(settings.CATALOG_IMAGE_WIDTHS),
+    )
+
+
+def store_variants(product_id: int, slug: str, variants: dict) -> None:
+    Product.objects.filter(pk=product_id).update(image_variants=variants)
+    # `.update()` skips the post_save signal: drop the cached payloads here.
+    invalidate_catalog("products", f"product:{slug}")
+
+
+def build_derivatives(product: Product) -> dict:
+    """Generate the derivatives of `product` in the current process."""
+    job = derivative_job(product)
+    variants = {}
+    if job is not None:
+        key, args = job
+        variants = {"source": key, **render_derivatives(*args)}
+    store_variants(product.pk, product.slug, variants)
+    return variants
+
+
+def schedule_derivatives(product: Product) -> None:
+    """Generate derivatives in the worker pool once the current transaction commits."""
+    product_id, slug = product.pk, product.slug
+    job = derivative_job(product)
+    if job is None:
+        transaction.on_commit(lambda: store_variants(product_id, slug, {}))
+        return
+    key, args = job
+
+    def done(future):
+        close_old_connections()
+        try:
+            store_variants(product_id, slug, {"source": key, **future.result()})
+        except Exception:
+            logger.exception("Image derivatives failed for product %s", product_id)
+        finally:
+            close_old_connections()
+
+    def submit():
+        _get_executor().submit(render_derivatives, *args).add_done_callback(done)
+
+    transaction.on_commit(submit)
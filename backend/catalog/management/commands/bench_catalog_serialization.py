@@ -0,0 +1,78 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from catalog.encoders import encode_products
+from catalog.models import Category, Product
+from catalog.serializers import ProductSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductSerializer + JSONRenderer with the fast catalog encoder "
+        "on synthetic catalogs (rows are created in a transaction and rolled back)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000])
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per path; the best time is kept.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options["sizes"], options["repeat"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, repeat):
+        category = Category.objects.create(
+            name="Bench — catégorie", slug="bench-serialization", description="Données de benchmark"
+        )
+        created = 0
+        self.stdout.write(f"{'products':>9} {'serializer':>12} {'encoder':>12} {'speedup':>8}")
+        for size in sorted(sizes):
+            Product.objects.bulk_create(
+                Product(
+                    category=category,
+                    name=f"Pâtisserie n°{i:05d} — miel & pistache",
+                    slug=f"bench-product-{i}",
+                    description="Feuilleté doré, sirop à la fleur d'oranger. Édition limitée.",
+                    price=Decimal("12.90") + i % 7,
+                    stock=i % 50,
+                    image_url=f"/catalog/bench_{i}.png",
+                )
+                for i in range(created, size)
+            )
+            created = max(created, size)
+            queryset = Product.objects.filter(category=category, is_active=True).select_related("category")
+
+            slow_body, slow = self._best(
+                repeat, lambda: JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+            )
+            fast_body, fast = self._best(repeat, lambda: encode_products(queryset))
+            if slow_body != fast_body:
+                raise CommandError(f"Encoder output differs from ProductSerializer at {size} products")
+
+            self.stdout.write(
+                f"{size:>9} {slow * 1000:>10.1f}ms {fast * 1000:>10.1f}ms {slow / fast:>7.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("Outputs are byte-identical."))
+
+    @staticmethod
+    def _best(repeat, func):
+        best = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+
+from catalog.image_derivatives import render_derivatives
+from catalog.images import derivative_job, needs_derivatives, store_variants
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG derivatives for product images (missing or outdated ones by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild even up-to-date derivatives.")
+        parser.add_argument("--all", action="store_true", help="Include inactive products.")
+        parser.add_argument("--workers", type=int, default=2, help="Worker processes.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.all() if options["all"] else Product.objects.filter(is_active=True)
+        todo = [p for p in products.order_by("id") if options["force"] or needs_derivatives(p)]
+        if not todo:
+            self.stdout.write("All product images are up to date.")
+            return
+
+        failures = 0
+        with ProcessPoolExecutor(max_workers=max(1, options["workers"]), mp_context=get_context("spawn")) as pool:
+            futures = {}
+            for product in todo:
+                job = derivative_job(product)
+                if job is None:
+                    store_variants(product.pk, product.slug, {})
+                    continue
+                key, job_args = job
+                futures[pool.submit(render_derivatives, *job_args)] = (product, key)
+
+            for future in as_completed(futures):
+                product, key = futures[future]
+                try:
+                    variants = future.result()
+                except Exception as exc:
+                    failures += 1
+                    self.stderr.write(f"{product.slug}: {exc}")
+                    continue
+                store_variants(product.pk, product.slug, {"source": key, **variants})
+                self.stdout.write(f"{product.slug}: {sum(len(v) for v in variants.values())} files")
+
+        style = self.style.WARNING if failures else self.style.SUCCESS
+        self.stdout.write(style(f"Done: {len(todo) - failures} product(s) processed, {failures} failure(s)."))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog.export import brotli, export_catalog
+
+
+class Command(BaseCommand):
+    help = "Write the catalog as static JSON files (+ .gz/.br) with a manifest of content hashes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=str(settings.CATALOG_EXPORT_DIR),
+            help="Target directory (default: CATALOG_EXPORT_DIR).",
+        )
+
+    def handle(self, *args, **options):
+        if brotli is None:
+            self.stdout.write(self.style.WARNING("brotli is not installed: skipping .br files."))
+        manifest = export_catalog(options["output"])
+        total = sum(entry["bytes"] for entry in manifest["files"].values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {len(manifest['files'])} documents ({total} bytes uncompressed) "
+                f"to {options['output']} (catalog version {manifest['version']})."
+            )
+        )
@@ -295,9 +295,17 @@ class Command(BaseCommand):
     help = "Seed catalog with a Ramadan Middle East pâtisserie selection (idempotent)."
 
     def handle(self, *args, **options):
+        from django.conf import settings
+
+        from catalog.cache import invalidate_catalog
+        from catalog.export import export_catalog
         from catalog.models import Category, Product
+        from catalog.suggest import suggestion_index
 
         self.stdout.write("Disabling existing catalog...")
+        # Les entrées en cache de ce qui est désactivé ici sont invalidées à la fin
+        disabled_categories = list(Category.objects.filter(is_active=True).values_list("pk", flat=True))
+        disabled_products = list(Product.objects.filter(is_active=True).values_list("slug", flat=True))
         Category.objects.all().update(is_active=False)
         Product.objects.all().update(is_active=False)
 
@@ -348,4 +356,18 @@ class Command(BaseCommand):
             ]
         ).delete()
 
+        # Les `.update(is_active=False)` ne déclenchent pas les signaux : on invalide
+        # explicitement les listes et les entrées des objets désactivés
+        invalidate_catalog(
+            "categories",
+            "products",
+            *(f"category:{pk}" for pk in disabled_categories),
+            *(f"product:{slug}" for slug in disabled_products),
+        )
+        suggestion_index.invalidate()
+
+        # Le process s'arrête juste après : export synchrone plutôt que différé
+        if settings.CATALOG_EXPORT_ON_CHANGE:
+            export_catalog(settings.CATALOG_EXPORT_DIR)
+
         self.stdout.write(self.style.SUCCESS("Ramadan catalog seeded successfully."))
@@ -0,0 +1,68 @@
+import unicodedata
+
+from django.db import migrations
+
+
+def _fold(text):
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def create_search_index(apps, schema_editor):
+    """
+    SQLite: FTS5 virtual table (rowid = product id).
+    PostgreSQL: tsvector table with a GIN index.
+    Text is accent-folded before indexing so both backends match "patisserie"
+    against "Pâtisserie" without the unaccent extension.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE catalog_productsearch USING fts5("
+            "name, category_name, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+        insert = (
+            "INSERT INTO catalog_productsearch (rowid, name, category_name, description) "
+            "VALUES (%s, %s, %s, %s)"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE TABLE catalog_productsearch ("
+            "product_id bigint PRIMARY KEY REFERENCES catalog_product (id) ON DELETE CASCADE, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX catalog_productsearch_document_idx "
+            "ON catalog_productsearch USING GIN (document)"
+        )
+        insert = (
+            "INSERT INTO catalog_productsearch (product_id, document) VALUES (%s, "
+            "setweight(to_tsvector('french', %s), 'A') || "
+            "setweight(to_tsvector('french', %s), 'B') || "
+            "setweight(to_tsvector('french', %s), 'C'))"
+        )
+    else:
+        return
+
+    Product = apps.get_model("catalog", "Product")
+    for product in Product.objects.select_related("category").iterator():
+        schema_editor.execute(
+            insert,
+            [product.pk, _fold(product.name), _fold(product.category.name), _fold(product.description)],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in {"sqlite", "postgresql"}:
+        schema_editor.execute("DROP TABLE IF EXISTS catalog_productsearch")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,4 +1,17 @@
 from django.db import models
+from django.db.models import Count, Max, Min, Q
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_product_stats(self):
+        """Annotate active product count, in-stock count and price range (one query)."""
+        active = Q(products__is_active=True)
+        return self.annotate(
+            product_count=Count("products", filter=active),
+            in_stock_count=Count("products", filter=active & Q(products__stock__gt=0)),
+            min_price=Min("products__price", filter=active),
+            max_price=Max("products__price", filter=active),
+        )
 
 
 class Category(models.Model):
@@ -9,6 +22,8 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ["name"]
@@ -31,11 +46,19 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     image = models.ImageField(upload_to="products/", blank=True, null=True)
     image_url = models.CharField(max_length=500, blank=True, default="")
+    # Resized WebP/JPEG copies, filled by catalog.images: {"source": key, "webp": {width: path}, ...}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            # Keyset pagination on (name, id), optionally within a category
+            models.Index(fields=["is_active", "category", "name"], name="product_active_cat_name_idx"),
+            # Price-range filters
+            models.Index(fields=["is_active", "price"], name="product_active_price_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset ("seek") pagination.
+
+    Rows are ordered by `ordering` (a tuple of field names, "-" for descending,
+    ending with a unique field) and the cursor holds the ordering values of the
+    last row served. The next page is fetched with a `WHERE (a, b) > (x, y)`
+    style filter, so page N costs the same as page 1 given a matching index.
+
+    Pagination is opt-in: without `limit` or `cursor` in the query string the
+    view returns the plain, unpaginated list as before.
+    """
+
+    ordering: tuple[str, ...] = ("id",)
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    default_limit = 24
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.limit_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position))
+
+        rows = list(queryset[: self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.page = rows[: self.limit]
+        return self.page
+
+    def get_limit(self, request) -> int:
+        raw = request.query_params.get(self.limit_query_param)
+        if raw in (None, ""):
+            return self.default_limit
+        try:
+            limit = int(raw)
+        except ValueError:
+            raise ValidationError({self.limit_query_param: "Must be an integer."})
+        return max(1, min(limit, self.max_limit))
+
+    def seek_filter(self, position) -> Q:
+        """Lexicographic "after `position`" condition over the ordering fields."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, obj) -> str:
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip("-"))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, request, model=None):
+        """
+        The position held by the `cursor` parameter, one value per ordering
+        field. Each value must be a JSON scalar that the model field accepts;
+        anything else is a 400, never a query with a nonsensical filter.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        invalid = ValidationError({self.cursor_query_param: "Invalid cursor."})
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        except (binascii.Error, ValueError, UnicodeError):
+            raise invalid
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise invalid
+        values = []
+        for field, value in zip(self.ordering, position):
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise invalid
+            if model is not None:
+                try:
+                    value = model._meta.get_field(field.lstrip("-")).to_python(value)
+                except DjangoValidationError:
+                    raise invalid
+            values.append(value)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class ProductKeysetPagination(KeysetPagination):
+    ordering = ("name", "id")
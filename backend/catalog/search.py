@@ -0,0 +1,129 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+SEARCH_TABLE = "catalog_productsearch"
+# Relative weight of each indexed column, most significant first.
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 1.0)  # name, category_name, description
+POSTGRES_CONFIG = "french"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents ("Pâtisseries feuilletées" -> "patisseries feuilletees")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def search_backend() -> str:
+    if connection.vendor in {"sqlite", "postgresql"}:
+        return connection.vendor
+    return "fallback"
+
+
+def _document(product: Product) -> tuple[str, str, str]:
+    return (
+        fold_text(product.name),
+        fold_text(product.category.name),
+        fold_text(product.description),
+    )
+
+
+def index_product(product: Product) -> None:
+    """Insert or refresh the search row of `product`."""
+    backend = search_backend()
+    if backend == "fallback":
+        return
+    name, category_name, description = _document(product)
+    with connection.cursor() as cursor:
+        if backend == "sqlite":
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, name, category_name, description) "
+                "VALUES (%s, %s, %s, %s)",
+                [product.pk, name, category_name, description],
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (product_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'C')) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                [product.pk, name, category_name, description],
+            )
+
+
+def remove_product(product_id: int) -> None:
+    backend = search_backend()
+    if backend == "fallback":
+        return
+    column = "rowid" if backend == "sqlite" else "product_id"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {column} = %s", [product_id])
+
+
+def match_query(words: list[str], backend: str) -> str:
+    """
+    Full-text query for the folded `words`: every word must match, the last
+    one as a prefix (search-as-you-type), on both backends.
+    """
+    if backend == "sqlite":
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+    # Words only hold \w characters, none of the tsquery operators
+    terms = list(words)
+    terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def _ranked_ids(query: str, limit: int) -> list[int]:
+    backend = search_backend()
+    words = _WORD_RE.findall(fold_text(query))
+    if not words:
+        return []
+
+    with connection.cursor() as cursor:
+        if backend == "sqlite":
+            weights = ", ".join(str(w) for w in SQLITE_BM25_WEIGHTS)
+            cursor.execute(
+                f"SELECT s.rowid FROM {SEARCH_TABLE} s "
+                "JOIN catalog_product p ON p.id = s.rowid "
+                f"WHERE {SEARCH_TABLE} MATCH %s AND p.is_active "
+                f"ORDER BY bm25({SEARCH_TABLE}, {weights}), p.name LIMIT %s",
+                [match_query(words, backend), limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT s.product_id FROM {SEARCH_TABLE} s "
+                "JOIN catalog_product p ON p.id = s.product_id, "
+                f"to_tsquery('{POSTGRES_CONFIG}', %s) query "
+                "WHERE s.document @@ query AND p.is_active "
+                "ORDER BY ts_rank(s.document, query) DESC, p.name LIMIT %s",
+                [match_query(words, backend), limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_products(query: str, limit: int = 20) -> list[Product]:
+    """Active products matching `query`, best match first."""
+    if search_backend() == "fallback":
+        condition = Q()
+        for word in query.split():
+            condition &= (
+                Q(name__icontains=word)
+                | Q(description__icontains=word)
+                | Q(category__name__icontains=word)
+            )
+        queryset = Product.objects.filter(is_active=True).select_related("category")
+        return list(queryset.filter(condition)[:limit])
+
+    ids = _ranked_ids(query, limit)
+    products = Product.objects.select_related("category").in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
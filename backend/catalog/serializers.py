@@ -1,9 +1,12 @@
 from rest_framework import serializers
 
+from config.sparse import SparseFieldsetMixin
+
+from .images import srcset_map
 from .models import Category, Product
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = [
@@ -15,8 +18,28 @@ class CategorySerializer(serializers.ModelSerializer):
         ]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class CategoryWithStatsSerializer(CategorySerializer):
+    """Category list entry with the figures the home page needs (see `with_product_stats`)."""
+    product_count = serializers.IntegerField(read_only=True)
+    in_stock_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + [
+            "product_count",
+            "in_stock_count",
+            "min_price",
+            "max_price",
+        ]
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
+    image_srcset = serializers.SerializerMethodField()
+
+    expandable_fields = ("category",)
+    field_sources = {"image_srcset": ("image_variants",)}
 
     class Meta:
         model = Product
@@ -29,6 +52,10 @@ class ProductSerializer(serializers.ModelSerializer):
             "stock",
             "is_active",
             "image_url",
+            "image_srcset",
             "category",
         ]
 
+    def get_image_srcset(self, obj):
+        return srcset_map(obj.image_variants)
+
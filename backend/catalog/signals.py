@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_availability, invalidate_catalog
+from .images import needs_derivatives, schedule_derivatives
+from .models import Category, Product
+from .search import index_product, remove_product
+from .suggest import suggestion_index
+
+
+SUGGESTION_FIELDS = ("name", "slug", "image_url", "is_active")
+
+
+def _suggestion_values(instance):
+    return tuple(instance.__dict__.get(field) for field in SUGGESTION_FIELDS)
+
+
+@receiver(post_init, sender=Product)
+def remember_product_state(sender, instance, **kwargs):
+    # A renamed slug must also drop the detail entry cached under the old one.
+    instance._catalog_previous_slug = instance.__dict__.get("slug")
+    # Stock and price edits leave the suggestion trie alone
+    instance._suggestion_values = _suggestion_values(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    # The category list carries product counts and price ranges
+    tags = {"categories", "products", f"product:{instance.slug}"}
+    previous_slug = getattr(instance, "_catalog_previous_slug", None)
+    if previous_slug and previous_slug != instance.slug:
+        tags.add(f"product:{previous_slug}")
+    instance._catalog_previous_slug = instance.slug
+    invalidate_catalog(*tags)
+    invalidate_availability([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_catalog("categories", "products", f"category:{instance.pk}")
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, **kwargs):
+    # The category name is part of each product's search document.
+    for product in instance.products.select_related("category"):
+        index_product(product)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_suggestions(sender, instance, created=False, **kwargs):
+    values = _suggestion_values(instance)
+    if created or values != getattr(instance, "_suggestion_values", None):
+        suggestion_index.update_product(instance)
+    instance._suggestion_values = values
+
+
+@receiver(post_delete, sender=Product)
+def drop_product_suggestions(sender, instance, **kwargs):
+    suggestion_index.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def refresh_image_derivatives(sender, instance, raw=False, **kwargs):
+    # New upload or new image_url: resize off the request path
+    if settings.CATALOG_IMAGE_PIPELINE and not raw and needs_derivatives(instance):
+        schedule_derivatives(instance)
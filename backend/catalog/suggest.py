@@ -0,0 +1,220 @@
+import heapq
+import json
+import re
+import threading
+
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .cache import bump_counter, read_counter
+from .models import Product
+from .search import fold_text
+
+_KEY_RE = re.compile(r"[a-z0-9]+")
+
+# Bumped when a product's name, slug, image or active flag changes
+NAMES_VERSION_KEY = "catalog:suggest:names"
+# Bumped when paid orders change popularity
+SALES_VERSION_KEY = "catalog:suggest:sales"
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        # Every product reachable below this node
+        self.ids: set[int] = set()
+
+
+class SuggestionIndex:
+    """
+    In-memory prefix trie over active product names and slugs.
+
+    Each word of the accent-folded name and slug is inserted; a node keeps the
+    ids of every product below it, so a lookup is one walk per query word plus
+    a top-k selection by popularity (units sold in paid orders).
+    The trie is built lazily on first use, then kept up to date per product by
+    the catalog signals. It has versions of its own, separate from the catalog
+    version that every stock change bumps: a name/slug change made by another
+    process triggers a rebuild on the next lookup, and sales recorded by
+    another process only reload the popularity counts.
+    """
+
+    max_cached_answers = 4096
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self._keys: dict[int, set[str]] = {}
+        self._fragments: dict[int, str] = {}
+        self._names: dict[int, str] = {}
+        self._popularity: dict[int, int] = {}
+        self._answers: dict[tuple, bytes] = {}
+        self._loaded = False
+        self._seen_names = None
+        self._seen_sales = None
+
+    # -- building -------------------------------------------------------
+
+    @staticmethod
+    def _product_keys(name: str, slug: str) -> set[str]:
+        return set(_KEY_RE.findall(fold_text(name))) | set(_KEY_RE.findall(slug.lower()))
+
+    def _insert(self, pk: int, name: str, slug: str, image_url: str) -> None:
+        keys = self._product_keys(name, slug)
+        for key in keys:
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+                node.ids.add(pk)
+        self._keys[pk] = keys
+        self._names[pk] = fold_text(name)
+        self._fragments[pk] = json.dumps(
+            {"id": pk, "name": name, "slug": slug, "image_url": image_url},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    def _remove(self, pk: int) -> None:
+        for key in self._keys.pop(pk, ()):
+            node = self._root
+            path = []
+            for char in key:
+                child = node.children.get(char)
+                if child is None:
+                    break
+                child.ids.discard(pk)
+                path.append((node, char, child))
+                node = child
+            # Prune branches that no longer lead to any product
+            for parent, char, child in reversed(path):
+                if child.ids:
+                    break
+                del parent.children[char]
+        self._fragments.pop(pk, None)
+        self._names.pop(pk, None)
+
+    @staticmethod
+    def _load_popularity() -> dict[int, int]:
+        from orders.models import OrderItem
+
+        return dict(
+            OrderItem.objects.filter(order__status="paid")
+            .values("product")
+            .annotate(units=Sum("quantity"))
+            .values_list("product", "units")
+        )
+
+    def rebuild(self) -> None:
+        # Versions are read first: a change made while loading triggers another rebuild
+        names_version = read_counter(NAMES_VERSION_KEY)
+        sales_version = read_counter(SALES_VERSION_KEY)
+        rows = Product.objects.filter(is_active=True).values_list("id", "name", "slug", "image_url")
+        popularity = self._load_popularity()
+        with self._lock:
+            self._root = _Node()
+            self._keys.clear()
+            self._fragments.clear()
+            self._names.clear()
+            for pk, name, slug, image_url in rows:
+                self._insert(pk, name, slug, image_url)
+            self._popularity = popularity
+            self._answers.clear()
+            self._loaded = True
+            self._seen_names = names_version
+            self._seen_sales = sales_version
+
+    def reload_popularity(self) -> None:
+        sales_version = read_counter(SALES_VERSION_KEY)
+        popularity = self._load_popularity()
+        with self._lock:
+            self._popularity = popularity
+            self._answers.clear()
+            self._seen_sales = sales_version
+
+    def _ensure_loaded(self) -> None:
+        versions = cache.get_many([NAMES_VERSION_KEY, SALES_VERSION_KEY])
+        if not self._loaded or versions.get(NAMES_VERSION_KEY) != self._seen_names:
+            self.rebuild()
+        elif versions.get(SALES_VERSION_KEY) != self._seen_sales:
+            self.reload_popularity()
+
+    def _bump(self, key: str, seen: str) -> None:
+        # Publish a local change to the other processes. The new version is
+        # only adopted when no other process changed anything since our last
+        # sync; otherwise the next lookup reloads.
+        previous = getattr(self, seen)
+        version = bump_counter(key)
+        setattr(self, seen, version if previous is not None and version == previous + 1 else None)
+
+    def invalidate(self) -> None:
+        """Rebuild the trie everywhere on the next lookup (after bulk updates that bypass signals)."""
+        with self._lock:
+            self._loaded = False
+            bump_counter(NAMES_VERSION_KEY)
+
+    # -- incremental updates -------------------------------------------
+
+    def update_product(self, product: Product) -> None:
+        """Re-insert `product` after its name, slug, image or active flag changed."""
+        with self._lock:
+            if self._loaded:
+                self._remove(product.pk)
+                if product.is_active:
+                    self._insert(product.pk, product.name, product.slug, product.image_url)
+                self._answers.clear()
+            self._bump(NAMES_VERSION_KEY, "_seen_names")
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            if self._loaded:
+                self._remove(product_id)
+                self._answers.clear()
+            self._bump(NAMES_VERSION_KEY, "_seen_names")
+
+    def record_sales(self, units_by_product: dict[int, int]) -> None:
+        """Bump popularity after an order is paid (no rebuild needed)."""
+        with self._lock:
+            for pk, units in units_by_product.items():
+                self._popularity[pk] = self._popularity.get(pk, 0) + units
+            self._answers.clear()
+            self._bump(SALES_VERSION_KEY, "_seen_sales")
+
+    # -- lookups --------------------------------------------------------
+
+    def suggest(self, prefix: str, limit: int = 8) -> bytes:
+        """JSON array (bytes) of the `limit` most popular products matching `prefix`."""
+        words = tuple(_KEY_RE.findall(fold_text(prefix)))
+        if not words:
+            return b"[]"
+
+        self._ensure_loaded()
+        cache_key = (words, limit)
+        answer = self._answers.get(cache_key)
+        if answer is not None:
+            return answer
+
+        with self._lock:
+            matches = None
+            for word in words:
+                node = self._root
+                for char in word:
+                    node = node.children.get(char)
+                    if node is None:
+                        break
+                ids = node.ids if node is not None else set()
+                matches = set(ids) if matches is None else matches & ids
+                if not matches:
+                    break
+
+            popularity = self._popularity
+            names = self._names
+            best = heapq.nsmallest(limit, matches or (), key=lambda pk: (-popularity.get(pk, 0), names[pk]))
+            answer = ("[" + ",".join(self._fragments[pk] for pk in best) + "]").encode("utf-8")
+            if len(self._answers) < self.max_cached_answers:
+                self._answers[cache_key] = answer
+        return answer
+
+
+suggestion_index = SuggestionIndex()
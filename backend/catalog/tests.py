@@ -1,3 +1,632 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from config.testing import QueryBudgetMixin, query_budget
+
+from .cache import bump_catalog_version, get_catalog_version, invalidate_stock, snapshot_cache
+from .encoders import encode_categories_with_stats, encode_products, product_dict, product_rows, render_json
+from .export import export_catalog
+from .images import build_derivatives, needs_derivatives, source_key
+from .models import Category, Product
+from .search import match_query
+from .serializers import CategoryWithStatsSerializer, ProductSerializer
+from .suggest import NAMES_VERSION_KEY, SALES_VERSION_KEY, suggestion_index
+
+
+class CatalogQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Catalog endpoints must not issue one query per product or category."""
+
+    def setUp(self):
+        cache.clear()
+        snapshot_cache.clear()
+        self.client = APIClient()
+        self.created = 0
+        self.add_products(2)
+
+    def add_products(self, count=3):
+        # A new category per batch so nested categories cannot hide an N+1.
+        index = self.created
+        category = Category.objects.create(name=f"Catégorie {index}", slug=f"categorie-{index}")
+        for i in range(index, index + count):
+            Product.objects.create(
+                category=category,
+                name=f"Baklawa n°{i}",
+                slug=f"baklawa-{i}",
+                description="Feuilleté au miel et pistache",
+                price=Decimal("10.50") + i,
+                stock=10,
+            )
+        self.created += count
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_category_list(self):
+        self.assertConstantQueries(lambda: self.get("/api/catalog/categories/"), self.add_products, max_queries=1)
+
+    def test_product_list(self):
+        self.assertConstantQueries(lambda: self.get("/api/catalog/products/"), self.add_products, max_queries=1)
+
+    def test_product_list_serializer_path(self):
+        # Price filters bypass the snapshot cache and use ProductSerializer
+        self.assertConstantQueries(
+            lambda: self.get("/api/catalog/products/", min_price="0"), self.add_products, max_queries=1
+        )
+
+    def test_product_list_paginated(self):
+        self.assertConstantQueries(
+            lambda: self.get("/api/catalog/products/", limit=50), self.add_products, max_queries=1
+        )
+
+    def test_product_list_sparse_fieldset(self):
+        fetch = lambda: self.get("/api/catalog/products/", fields="id,name,category", limit=50)
+        self.assertConstantQueries(fetch, self.add_products, max_queries=1)
+        product = fetch().json()["results"][0]
+        self.assertEqual(set(product), {"id", "name", "category"})
+        self.assertIsInstance(product["category"], int)
+
+    def test_product_list_expand(self):
+        fetch = lambda: self.get("/api/catalog/products/", fields="slug,category.name", expand="category")
+        self.assertConstantQueries(fetch, self.add_products, max_queries=1)
+        self.assertEqual(set(fetch().json()[0]["category"]), {"name"})
+
+    def test_product_detail(self):
+        self.assertConstantQueries(
+            lambda: self.get("/api/catalog/products/baklawa-0/"), self.add_products, max_queries=1
+        )
+
+    def test_product_search(self):
+        def fetch():
+            self.assertTrue(self.get("/api/catalog/search/", q="baklawa").json())
+
+        self.assertConstantQueries(fetch, self.add_products, max_queries=2)
+
+    def test_product_suggest(self):
+        self.get("/api/catalog/suggest/", prefix="bak")  # builds the trie
+
+        def fetch():
+            self.assertTrue(self.get("/api/catalog/suggest/", prefix="bak").json())
+
+        self.assertConstantQueries(fetch, self.add_products, max_queries=0)
+
+    def test_product_availability(self):
+        ids = list(Product.objects.values_list("pk", flat=True))
+
+        def fetch():
+            response = self.get("/api/catalog/availability/", ids=",".join(map(str, ids)))
+            self.assertEqual(len(response.json()), len(ids))
+
+        def grow():
+            self.add_products()
+            ids[:] = Product.objects.values_list("pk", flat=True)
+            cache.clear()
+
+        self.assertConstantQueries(fetch, grow, max_queries=1)
+
+    def test_not_modified_skips_database(self):
+        etag = self.get("/api/catalog/products/")["ETag"]
+        with query_budget(0):
+            response = self.client.get("/api/catalog/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class CatalogConditionalTests(TestCase):
+    """ETags follow the catalog version and the negotiated representation."""
+
+    def setUp(self):
+        cache.clear()
+        snapshot_cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name="Coffrets", slug="coffrets")
+        self.product = Product.objects.create(
+            category=category, name="Coffret dattes", slug="coffret-dattes", price=Decimal("12.00"), stock=5
+        )
+
+    def test_not_modified_until_product_saved(self):
+        etag = self.client.get("/api/catalog/products/")["ETag"]
+        response = self.client.get("/api/catalog/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.product.price = Decimal("13.00")
+        self.product.save()
+
+        response = self.client.get("/api/catalog/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        prices = {product["slug"]: product["price"] for product in response.json()}
+        self.assertEqual(prices["coffret-dattes"], "13.00")
+
+    def test_etag_depends_on_accept(self):
+        json_etag = self.client.get("/api/catalog/products/", HTTP_ACCEPT="application/json")["ETag"]
+        html_etag = self.client.get("/api/catalog/products/", HTTP_ACCEPT="text/html")["ETag"]
+        self.assertNotEqual(json_etag, html_etag)
+
+        response = self.client.get("/api/catalog/products/", HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH=json_etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CATALOG_IMAGE_PIPELINE=False, CATALOG_EXPORT_ON_CHANGE=False)
+class SnapshotInvalidationTests(TestCase):
+    """Writes only drop the cached bodies that embed the changed objects."""
+
+    def setUp(self):
+        cache.clear()
+        snapshot_cache.clear()
+        self.client = APIClient()
+        self.dates = Category.objects.create(name="Dattes", slug="dattes")
+        self.sweets = Category.objects.create(name="Douceurs", slug="douceurs")
+        self.medjool = self.create_product(self.dates, "medjool")
+        self.deglet = self.create_product(self.dates, "deglet-nour")
+        self.baklawa = self.create_product(self.sweets, "baklawa")
+        self.warm()
+
+    def create_product(self, category, slug):
+        return Product.objects.create(category=category, name=slug.title(), slug=slug, price=Decimal("9.00"), stock=3)
+
+    def warm(self):
+        for url in ("/api/catalog/categories/", "/api/catalog/products/"):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        for product in (self.medjool, self.deglet, self.baklawa):
+            self.assertEqual(self.client.get(f"/api/catalog/products/{product.slug}/").status_code, 200)
+
+    def test_product_edit_drops_its_entries_and_listings(self):
+        self.medjool.stock = 1
+        self.medjool.save()
+        self.assertNotIn("product:medjool", snapshot_cache)
+        self.assertNotIn("products", snapshot_cache)
+        self.assertNotIn("categories", snapshot_cache)
+        self.assertIn("product:deglet-nour", snapshot_cache)
+        self.assertIn("product:baklawa", snapshot_cache)
+
+    def test_slug_rename_drops_old_slug(self):
+        self.medjool.slug = "medjool-premium"
+        self.medjool.save()
+        self.assertNotIn("product:medjool", snapshot_cache)
+        self.assertEqual(self.client.get("/api/catalog/products/medjool/").status_code, 404)
+        self.assertEqual(self.client.get("/api/catalog/products/medjool-premium/").status_code, 200)
+
+    def test_category_delete_drops_its_products(self):
+        self.dates.delete()
+        self.assertNotIn("product:medjool", snapshot_cache)
+        self.assertNotIn("product:deglet-nour", snapshot_cache)
+        self.assertIn("product:baklawa", snapshot_cache)
+        self.assertEqual(self.client.get("/api/catalog/products/medjool/").status_code, 404)
+
+    def test_bump_from_another_process_drops_everything(self):
+        # Another process (e.g. the webhook worker) changed stock and bumped the version
+        Product.objects.filter(pk=self.medjool.pk).update(stock=5)
+        bump_catalog_version()
+        # A local write to an unrelated object must not adopt that version
+        self.sweets.save()
+        self.assertNotIn("product:medjool", snapshot_cache)
+        response = self.client.get("/api/catalog/products/medjool/")
+        self.assertEqual(response.json()["stock"], 5)
+
+    def test_seed_drops_only_touched_entries(self):
+        snapshot_cache.get_or_build("unrelated", lambda: b"{}", tags={"unrelated"})
+        call_command("seed_ramadan_catalog", stdout=StringIO())
+        # Products missing from the seed are disabled by a queryset update
+        self.assertNotIn("product:medjool", snapshot_cache)
+        self.assertNotIn("products", snapshot_cache)
+        self.assertIn("unrelated", snapshot_cache)
+        self.assertEqual(self.client.get("/api/catalog/products/medjool/").status_code, 404)
+
+    def test_concurrent_bumps_get_distinct_versions(self):
+        start = get_catalog_version()
+        versions = []
+
+        def bump():
+            for _ in range(50):
+                versions.append(bump_catalog_version())
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(versions)), 200)
+        self.assertEqual(get_catalog_version(), start + 200)
+
+
+class ProductCursorPaginationTests(TestCase):
+    """Keyset pages over (name, id) on a category of their own, away from seeded rows."""
+
+    def setUp(self):
+        cache.clear()
+        snapshot_cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Pagination", slug="pagination")
+        # Equal names only differ by id, the tie-breaker
+        for name in ("Chebakia", "Briouat", "Chebakia", "Briouat", "Ghriba", "Chebakia", "Sellou"):
+            Product.objects.create(
+                category=self.category, name=name, slug=f"p-{Product.objects.count()}",
+                price=Decimal("5.00"), stock=0 if name == "Sellou" else 2,
+            )
+
+    def pages(self, params):
+        url, seen = "/api/catalog/products/", []
+        params = {"category": "pagination", **params}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.append([item["id"] for item in response.json()["results"]])
+            url, params = response.json()["next"], None
+        return seen
+
+    def expected(self, **filters):
+        products = Product.objects.filter(category=self.category, **filters).order_by("name", "id")
+        return list(products.values_list("id", flat=True))
+
+    def test_pages_follow_name_then_id(self):
+        pages = self.pages({"limit": 2})
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.expected())
+
+    def test_cursor_round_trip(self):
+        first = self.client.get("/api/catalog/products/", {"category": "pagination", "limit": 3}).json()
+        cursor = first["next"].split("cursor=")[1].split("&")[0]
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last = Product.objects.get(pk=first["results"][-1]["id"])
+        self.assertEqual(json.loads(base64.urlsafe_b64decode(padded)), [last.name, last.pk])
+
+    def test_filters_apply_on_every_page(self):
+        pages = self.pages({"limit": 2, "in_stock": "1"})
+        self.assertEqual(sum(pages, []), self.expected(stock__gt=0))
+
+    def test_malformed_cursor_is_rejected(self):
+        for position in ([{}, 1], ["Briouat"], ["Briouat", "abc"], [True, 1], ["Briouat", [1]], {"name": "x"}):
+            raw = json.dumps(position).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+            response = self.client.get("/api/catalog/products/", {"limit": 2, "cursor": cursor})
+            self.assertEqual(response.status_code, 400, position)
+            self.assertIn("cursor", response.json())
+        response = self.client.get("/api/catalog/products/", {"limit": 2, "cursor": "not-base64!"})
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor in {"sqlite", "postgresql"}, "full-text index")
+class ProductSearchTests(TestCase):
+    """
+    Search behaviour on the full-text index (SQLite FTS5 or PostgreSQL
+    tsvector, kept in sync by the signals): both backends run these tests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        snapshot_cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name="Gâteaux zelmane", slug="gateaux-zelmane")
+        self.by_name = Product.objects.create(
+            category=category, name="Kaak zoubida", slug="kaak-zoubida", price=Decimal("4.00"), stock=5
+        )
+        self.by_description = Product.objects.create(
+            category=category, name="Feqqas", slug="feqqas", price=Decimal("4.00"), stock=5,
+            description="Biscuit croquant, cousin du kaak zoubida.",
+        )
+        self.accented = Product.objects.create(
+            category=category, name="Pâtisserie Yasmîna", slug="patisserie-yasmina", price=Decimal("6.00"), stock=5
+        )
+
+    def search(self, q):
+        response = self.client.get("/api/catalog/search/", {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [item["slug"] for item in response.json()]
+
+    def test_accent_insensitive(self):
+        self.assertEqual(self.search("patisserie yasmina"), ["patisserie-yasmina"])
+        self.assertEqual(self.search("PÂTISSERIE YASMÎNA"), ["patisserie-yasmina"])
+        # The last word is a prefix
+        self.assertEqual(self.search("patisserie yasm"), ["patisserie-yasmina"])
+
+    def test_match_query_prefixes_last_word_on_both_backends(self):
+        words = ["patisserie", "yasm"]
+        self.assertEqual(match_query(words, "sqlite"), '"patisserie" "yasm"*')
+        self.assertEqual(match_query(words, "postgresql"), "patisserie & yasm:*")
+
+    def test_partial_word(self):
+        self.assertEqual(self.search("zoub"), ["kaak-zoubida", "feqqas"])
+        self.assertEqual(self.search("kaak zoub"), ["kaak-zoubida", "feqqas"])
+        # Only the last word is a prefix
+        self.assertEqual(self.search("kaa zoubida"), [])
+
+    def test_name_hits_rank_above_description_hits(self):
+        self.assertEqual(self.search("zoubida"), ["kaak-zoubida", "feqqas"])
+
+    def test_category_name_is_searched(self):
+        self.assertEqual(set(self.search("zelmane")), {"kaak-zoubida", "feqqas", "patisserie-yasmina"})
+
+    def test_inactive_and_edited_products(self):
+        self.by_name.is_active = False
+        self.by_name.save()
+        self.assertEqual(self.search("zoubida"), ["feqqas"])
+        self.by_description.description = "Biscuit croquant."
+        self.by_description.save()
+        self.assertEqual(self.search("zoubida"), [])
+
+    def test_icontains_fallback(self):
+        with mock.patch("catalog.search.search_backend", return_value="fallback"):
+            self.assertEqual(set(self.search("ZOUBIDA")), {"kaak-zoubida", "feqqas"})
+            self.assertEqual(self.search("kaak croquant"), ["feqqas"])
+            self.assertEqual(self.search("zelmane yasm"), ["patisserie-yasmina"])
+            self.by_name.is_active = False
+            self.by_name.save()
+            self.assertEqual(self.search("kaak"), ["feqqas"])
+
+
+class SuggestionIndexTests(TestCase):
+    def setUp(self):
+        # A cold cache drops the index versions: the first lookup rebuilds
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Suggestions", slug="suggestions")
+        self.zalabia = self.create_product("Zalabia au miel", "zalabia-miel")
+        self.zaatar = self.create_product("Zaatar grillé", "zaatar")
+        self.crepe = self.create_product("Crêpe zalabienne", "crepe-zalabienne")
+
+    def create_product(self, name, slug):
+        return Product.objects.create(category=self.category, name=name, slug=slug, price=Decimal("3.00"), stock=5)
+
+    def suggest(self, prefix, **params):
+        response = self.client.get("/api/catalog/suggest/", {"prefix": prefix, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item["slug"] for item in response.json()]
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.suggest("zala"), ["crepe-zalabienne", "zalabia-miel"])
+        self.assertEqual(self.suggest("zal mi"), ["zalabia-miel"])
+        self.assertEqual(self.suggest("zaat"), ["zaatar"])
+        self.assertEqual(self.suggest("zalx"), [])
+        self.assertEqual(self.suggest("zala", limit=1), ["crepe-zalabienne"])
+
+    def test_accent_folding(self):
+        self.assertEqual(self.suggest("crepe zal"), ["crepe-zalabienne"])
+        self.assertEqual(self.suggest("CRÊPE"), self.suggest("crepe"))
+        self.assertEqual(self.suggest("zaatar grille"), ["zaatar"])
+
+    def test_ranking_by_units_sold(self):
+        from django.contrib.auth.models import User
+
+        from orders.models import Order, OrderItem
+
+        user = User.objects.create_user("suggest@example.com", "suggest@example.com", "motdepasse")
+        order = Order.objects.create(user=user, total_amount=Decimal("9.00"), status="paid")
+        OrderItem.objects.create(order=order, product=self.zalabia, quantity=3, price=Decimal("3.00"))
+        suggestion_index.rebuild()
+        self.assertEqual(self.suggest("zala"), ["zalabia-miel", "crepe-zalabienne"])
+
+    def test_record_sales(self):
+        self.assertEqual(self.suggest("zala"), ["crepe-zalabienne", "zalabia-miel"])
+        suggestion_index.record_sales({self.zalabia.pk: 2})
+        self.assertEqual(self.suggest("zala"), ["zalabia-miel", "crepe-zalabienne"])
+
+    def test_product_updates_apply_in_place(self):
+        self.suggest("zala")
+        with self.assertNumQueries(0):
+            self.zaatar.name = "Zalouk"
+            suggestion_index.update_product(self.zaatar)
+            suggestion_index.remove_product(self.crepe.pk)
+            self.assertEqual(self.suggest("zal"), ["zalabia-miel", "zaatar"])
+
+    def test_stock_changes_do_not_rebuild(self):
+        self.suggest("zala")
+        invalidate_stock([self.zalabia.pk])
+        self.crepe.stock = 1
+        self.crepe.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest("zala"), ["crepe-zalabienne", "zalabia-miel"])
+
+    def test_changes_from_other_processes(self):
+        self.suggest("zala")
+        # Another process recorded sales: only popularity is reloaded
+        cache.incr(SALES_VERSION_KEY)
+        with self.assertNumQueries(1):
+            self.suggest("zala")
+        # Another process renamed a product: full rebuild
+        Product.objects.filter(pk=self.zaatar.pk).update(name="Zalouk")
+        cache.incr(NAMES_VERSION_KEY)
+        with self.assertNumQueries(2):
+            self.assertIn("zaatar", self.suggest("zalou"))
+
+
+class EncoderParityTests(TestCase):
+    """The fast encoders must produce the bytes DRF renders from the serializers."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Encodage « spécial »", slug="encodage", description="Ligne\u2028suivante")
+        Category.objects.create(name="Vide", slug="vide")
+        Product.objects.create(
+            category=self.category, name="Maamoul 🌙", slug="maamoul", price=Decimal("12.5"), stock=0,
+            description="Dattes, \"pistaches\" & eau de fleur d'oranger\u2029", image_url="/catalog/maamoul.png",
+            image_variants={"source": "abc", "webp": {"640": "d/640.webp", "320": "d/320.webp"}, "jpeg": {"320": "d/320.jpg"}},
+        )
+        Product.objects.create(category=self.category, name="Ghriba", slug="ghriba", price=Decimal("3"), stock=7)
+
+    def render(self, serializer):
+        return JSONRenderer().render(serializer.data)
+
+    def test_product_list(self):
+        queryset = Product.objects.filter(category=self.category).select_related("category").order_by("name")
+        self.assertEqual(encode_products(queryset), self.render(ProductSerializer(queryset, many=True)))
+
+    def test_product_detail(self):
+        queryset = Product.objects.filter(slug="maamoul").select_related("category")
+        encoded = render_json(product_dict(product_rows(queryset).get()))
+        self.assertEqual(encoded, self.render(ProductSerializer(queryset.get())))
+
+    def test_categories_with_stats(self):
+        queryset = Category.objects.filter(slug__in=["encodage", "vide"]).with_product_stats().order_by("slug")
+        self.assertEqual(
+            encode_categories_with_stats(queryset), self.render(CategoryWithStatsSerializer(queryset, many=True))
+        )
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        from PIL import Image
+
+        cache.clear()
+        snapshot_cache.clear()
+        self.client = APIClient()
+        tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(
+            MEDIA_ROOT=tmp / "media", CATALOG_PUBLIC_DIR=tmp / "public", CATALOG_IMAGE_WIDTHS=[320, 640]
+        ))
+        (tmp / "public" / "catalog").mkdir(parents=True)
+        self.source = tmp / "public" / "catalog" / "fixture.png"
+        Image.new("RGBA", (800, 400), (200, 120, 40, 128)).save(self.source)
+        category = Category.objects.create(name="Images", slug="images")
+        self.product = Product.objects.create(
+            category=category, name="Fixture", slug="fixture", price=Decimal("2.00"), stock=1,
+            image_url="/catalog/fixture.png",
+        )
+
+    def detail(self):
+        response = self.client.get("/api/catalog/products/fixture/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assert_variants(self, variants):
+        base = f"products/derivatives/{self.product.pk}/{source_key(str(self.source))}"
+        self.assertEqual(variants, {
+            "source": source_key(str(self.source)),
+            "webp": {"320": f"{base}/320.webp", "640": f"{base}/640.webp"},
+            "jpeg": {"320": f"{base}/320.jpg", "640": f"{base}/640.jpg"},
+        })
+        for files in (variants["webp"], variants["jpeg"]):
+            for path in files.values():
+                self.assertTrue((Path(settings.MEDIA_ROOT) / path).is_file(), path)
+
+    def test_pipeline_is_off_by_default(self):
+        self.assertFalse(settings.CATALOG_IMAGE_PIPELINE)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_variants, {})
+
+    def test_build_derivatives(self):
+        self.assertEqual(self.detail()["image_srcset"], {})
+        self.assertTrue(needs_derivatives(self.product))
+        build_derivatives(self.product)
+        self.assertNotIn("product:fixture", snapshot_cache)
+        self.product.refresh_from_db()
+        self.assert_variants(self.product.image_variants)
+        self.assertFalse(needs_derivatives(self.product))
+        srcset = self.detail()["image_srcset"]
+        self.assertIn("640.webp 640w", srcset["webp"])
+        self.assertIn("320.jpg 320w", srcset["jpeg"])
+
+    def test_command(self):
+        self.detail()
+        out = StringIO()
+        call_command("build_image_derivatives", workers=1, stdout=out, stderr=StringIO())
+        self.assertIn("fixture: 4 files", out.getvalue())
+        self.assertNotIn("product:fixture", snapshot_cache)
+        self.product.refresh_from_db()
+        self.assert_variants(self.product.image_variants)
+        self.assertIn("640w", self.detail()["image_srcset"]["webp"])
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        self.output = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.category = Category.objects.create(name="Export", slug="export")
+        self.product = Product.objects.create(
+            category=self.category, name="Briouat", slug="briouat-export", price=Decimal("1.50"), stock=4
+        )
+
+    def test_manifest_lists_every_document(self):
+        manifest = export_catalog(self.output)
+        self.assertEqual(manifest, json.loads((self.output / "manifest.json").read_bytes()))
+        self.assertEqual(manifest["version"], get_catalog_version())
+        files = manifest["files"]
+        for relative in ("categories.json", "products.json", "products/briouat-export.json", "products/category/export.json"):
+            body = (self.output / relative).read_bytes()
+            self.assertEqual(files[relative]["sha256"], hashlib.sha256(body).hexdigest())
+            self.assertEqual(files[relative]["bytes"], len(body))
+            compressed = (self.output / f"{relative}.gz").read_bytes()
+            self.assertEqual(files[relative]["gz_bytes"], len(compressed))
+            self.assertEqual(gzip.decompress(compressed), body)
+        detail = json.loads((self.output / "products/briouat-export.json").read_bytes())
+        self.assertEqual((detail["price"], detail["category"]["slug"]), ("1.50", "export"))
+
+    def test_only_previous_exports_are_removed(self):
+        export_catalog(self.output)
+        unrelated = [self.output / "package.json", self.output / "products" / "notes.json.gz"]
+        for path in unrelated:
+            path.write_text("{}")
+        self.product.is_active = False
+        self.product.save()
+        manifest = export_catalog(self.output)
+        self.assertNotIn("products/briouat-export.json", manifest["files"])
+        self.assertFalse((self.output / "products/briouat-export.json").exists())
+        self.assertFalse((self.output / "products/briouat-export.json.gz").exists())
+        self.assertTrue((self.output / "products/category/export.json").exists())
+        for path in unrelated:
+            self.assertTrue(path.exists(), path)
+
+    def test_empty_export_dir(self):
+        from config.settings import BASE_DIR, _env_path
+
+        with mock.patch.dict(os.environ, {"CATALOG_EXPORT_DIR": ""}):
+            self.assertEqual(_env_path("CATALOG_EXPORT_DIR", BASE_DIR / "catalog_export"), BASE_DIR / "catalog_export")
+        with self.assertRaises(ValueError):
+            export_catalog("")
+
+
+class CategoryStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        snapshot_cache.clear()
+        self.dates = Category.objects.create(name="Dattes stats", slug="dattes-stats")
+        self.empty = Category.objects.create(name="Vide stats", slug="vide-stats")
+        for slug, price, stock, active in (
+            ("medjool-stats", "18.00", 3, True),
+            ("deglet-stats", "9.50", 0, True),
+            ("ajwa-stats", "4.00", 8, False),
+        ):
+            Product.objects.create(
+                category=self.dates, name=slug, slug=slug, price=Decimal(price), stock=stock, is_active=active
+            )
+
+    def stats(self, queryset):
+        return {
+            category.slug: (category.product_count, category.in_stock_count, category.min_price, category.max_price)
+            for category in queryset.filter(slug__in=["dattes-stats", "vide-stats"])
+        }
+
+    def test_with_product_stats(self):
+        with self.assertNumQueries(1):
+            stats = self.stats(Category.objects.with_product_stats())
+        # The inactive 4.00 product is left out of the count and the price range
+        self.assertEqual(stats, {
+            "dattes-stats": (2, 1, Decimal("9.50"), Decimal("18.00")),
+            "vide-stats": (0, 0, None, None),
+        })
+
+    def test_category_list_payload(self):
+        response = APIClient().get("/api/catalog/categories/")
+        self.assertEqual(response.status_code, 200)
+        payload = {item["slug"]: item for item in response.json()}
+        self.assertEqual(
+            [payload["dattes-stats"][key] for key in ("product_count", "in_stock_count", "min_price", "max_price")],
+            [2, 1, "9.50", "18.00"],
+        )
+        self.assertEqual(payload["vide-stats"]["product_count"], 0)
+        self.assertIsNone(payload["vide-stats"]["min_price"])
@@ -1,10 +1,20 @@
 from django.urls import path
 
-from .views import CategoryListView, ProductDetailView, ProductListView
+from .views import (
+    CategoryListView,
+    ProductAvailabilityView,
+    ProductDetailView,
+    ProductListView,
+    ProductSearchView,
+    ProductSuggestView,
+)
 
 
 urlpatterns = [
     path("categories/", CategoryListView.as_view(), name="category-list"),
+    path("search/", ProductSearchView.as_view(), name="product-search"),
+    path("suggest/", ProductSuggestView.as_view(), name="product-suggest"),
+    path("availability/", ProductAvailabilityView.as_view(), name="product-availability"),
     path("products/", ProductListView.as_view(), name="product-list"),
     path("products/<slug:slug>/", ProductDetailView.as_view(), name="product-detail"),
 ]
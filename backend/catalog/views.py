@@ -1,24 +1,258 @@
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from rest_framework import generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from config.sparse import EXPAND_PARAM, FIELDS_PARAM, restrict_queryset, sparse_spec
 
+from .cache import (
+    AVAILABILITY_TTL,
+    catalog_last_modified,
+    get_availability,
+    get_catalog_version,
+    snapshot_cache,
+)
+from .encoders import encode_categories_with_stats, encode_products, product_dict, product_rows, render_json
 from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer
+from .pagination import ProductKeysetPagination
+from .search import search_products
+from .serializers import CategoryWithStatsSerializer, ProductSerializer
+from .suggest import suggestion_index
+
+
+def _catalog_etag(request, *args, **kwargs):
+    """
+    Strong ETag derived from the catalog version.
+    The path and Accept header are folded in so that each representation
+    (JSON, browsable API, query variants) gets its own validator.
+    """
+    variant = f"{request.get_full_path()}|{request.headers.get('Accept', '')}"
+    digest = hashlib.md5(variant.encode("utf-8")).hexdigest()[:12]
+    return f'"catalog-{get_catalog_version()}-{digest}"'
+
+
+def _catalog_last_modified(request, *args, **kwargs):
+    return catalog_last_modified()
+
+
+# Browsers must revalidate (no heuristic freshness), which becomes a cheap 304
+# as long as the catalog version has not moved.
+catalog_conditional = [
+    cache_control(public=True, no_cache=True),
+    condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified),
+]
+
+
+class SnapshotCacheMixin:
+    """
+    Serve plain JSON requests from the in-process snapshot cache.
+    Bodies are built by the fast encoders in `catalog/encoders.py`; other
+    renderers (browsable API) and sparse fieldsets (`?fields=`/`?expand=`) go
+    through the regular DRF serializer path.
+    """
+
+    def use_snapshot(self, request) -> bool:
+        params = request.query_params
+        return (
+            request.accepted_renderer.format == "json"
+            and FIELDS_PARAM not in params
+            and EXPAND_PARAM not in params
+        )
 
+    def snapshot_response(self, key, build, tags=()):
+        body = snapshot_cache.get_or_build(key, build, tags=tags)
+        return HttpResponse(body, content_type="application/json")
 
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.filter(is_active=True)
-    serializer_class = CategorySerializer
+
+@method_decorator(catalog_conditional, name="dispatch")
+class CategoryListView(SnapshotCacheMixin, generics.ListAPIView):
+    """Active categories with active/in-stock product counts and price range."""
+
+    queryset = Category.objects.filter(is_active=True).with_product_stats()
+    serializer_class = CategoryWithStatsSerializer
     permission_classes = [AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        if not self.use_snapshot(request):
+            return super().list(request, *args, **kwargs)
+        return self.snapshot_response(
+            "categories", lambda: encode_categories_with_stats(self.get_queryset())
+        )
+
+
+def _price_param(request, name):
+    raw = request.query_params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: "Must be a decimal number."})
+
+
+@method_decorator(catalog_conditional, name="dispatch")
+class ProductListView(SnapshotCacheMixin, generics.ListAPIView):
+    """
+    Active products, optionally filtered with `?category=<slug>`, `?in_stock=1`,
+    `?min_price=` and `?max_price=`. Pass `?limit=` (then follow `next`) for
+    keyset pagination on (name, id). `?fields=`/`?expand=` select a sparse fieldset.
+    """
 
-class ProductListView(generics.ListAPIView):
-    queryset = Product.objects.filter(is_active=True)
+    queryset = Product.objects.filter(is_active=True).select_related("category")
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
+    pagination_class = ProductKeysetPagination
+    # Unpaginated lists for these filters only have a handful of variants.
+    snapshot_params = {"category", "in_stock"}
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
 
-class ProductDetailView(generics.RetrieveAPIView):
+        category = params.get("category")
+        if category:
+            queryset = queryset.filter(category__slug=category)
+        if params.get("in_stock", "").lower() in {"1", "true", "yes"}:
+            queryset = queryset.filter(stock__gt=0)
+        min_price = _price_param(self.request, "min_price")
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        max_price = _price_param(self.request, "max_price")
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+        # The keyset cursor reads the ordering columns.
+        return restrict_queryset(
+            queryset, ProductSerializer, *sparse_spec(self.request), extra_columns=("name",)
+        )
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if not self.use_snapshot(request) or not set(params) <= self.snapshot_params:
+            return super().list(request, *args, **kwargs)
+        key = "products"
+        if params:
+            key = "products?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return self.snapshot_response(
+            key, lambda: encode_products(self.get_queryset()), tags={"products"}
+        )
+
+
+@method_decorator(catalog_conditional, name="dispatch")
+class ProductDetailView(SnapshotCacheMixin, generics.RetrieveAPIView):
     lookup_field = "slug"
-    queryset = Product.objects.filter(is_active=True)
+    queryset = Product.objects.filter(is_active=True).select_related("category")
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        return restrict_queryset(super().get_queryset(), ProductSerializer, *sparse_spec(self.request))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_snapshot(request):
+            return super().retrieve(request, *args, **kwargs)
+        slug = kwargs[self.lookup_field]
+        queryset = self.get_queryset().filter(slug=slug)
+        # Tags are read after build() runs; missing products raise Http404
+        # and are never cached.
+        tags = set()
+
+        def build():
+            row = product_rows(queryset).first()
+            if row is None:
+                raise Http404
+            product = product_dict(row)
+            tags.add(f"category:{product['category']['id']}")
+            return render_json(product)
+
+        return self.snapshot_response(f"product:{slug}", build, tags=tags)
+
+
+@method_decorator(catalog_conditional, name="dispatch")
+class ProductSearchView(generics.ListAPIView):
+    """
+    Full-text search over product name, description and category name:
+    `?q=<text>` (accent-insensitive), best matches first, at most `?limit=` (max 50).
+    """
+
+    serializer_class = ProductSerializer
+    permission_classes = [AllowAny]
+    pagination_class = None
+    default_limit = 20
+    max_limit = 50
+
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            return []
+        try:
+            limit = int(self.request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        return search_products(query, limit=max(1, min(limit, self.max_limit)))
+
+
+class ProductSuggestView(APIView):
+    """
+    Search-as-you-type: `?prefix=<text>` returns up to `?limit=` (max 20) products
+    whose name or slug words start with the typed words, most popular first.
+    Answered from the in-memory suggestion trie, without touching the database.
+    """
+
+    permission_classes = [AllowAny]
+    default_limit = 8
+    max_limit = 20
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        body = suggestion_index.suggest(
+            request.query_params.get("prefix", ""),
+            limit=max(1, min(limit, self.max_limit)),
+        )
+        return HttpResponse(body, content_type="application/json")
+
+
+class ProductAvailabilityView(APIView):
+    """
+    Live stock for the cart and product pages, without the full product payload:
+    `GET ?ids=1,2,3` or `POST {"ids": [1, 2, 3]}` -> `{"1": {"stock": 4, "is_active": true}, ...}`.
+    Unknown ids are left out. Answers may be up to a few seconds old.
+    """
+
+    permission_classes = [AllowAny]
+    max_ids = 200
+
+    def parse_ids(self, raw):
+        if isinstance(raw, str):
+            raw = [part for part in raw.split(",") if part.strip()]
+        if not isinstance(raw, list) or not raw:
+            raise ValidationError({"ids": "Provide a list of product ids."})
+        if len(raw) > self.max_ids:
+            raise ValidationError({"ids": f"At most {self.max_ids} ids per request."})
+        try:
+            return sorted({int(str(pk).strip()) for pk in raw})
+        except ValueError:
+            raise ValidationError({"ids": "Ids must be integers."})
+
+    def availability_response(self, ids):
+        availability = get_availability(ids)
+        return Response({str(pk): availability[pk] for pk in ids if pk in availability})
+
+    def get(self, request, *args, **kwargs):
+        response = self.availability_response(self.parse_ids(request.query_params.get("ids", "")))
+        patch_cache_control(response, public=True, max_age=AVAILABILITY_TTL)
+        return response
+
+    def post(self, request, *args, **kwargs):
+        return self.availability_response(self.parse_ids((request.data or {}).get("ids")))
@@ -43,6 +43,14 @@ def _env_list(key: str, default: list[str]) -> list[str]:
         return default
     return [v.strip() for v in raw.split(",") if v.strip()]
 
+
+def _env_path(key: str, default: Path) -> Path:
+    # An empty value (e.g. `CATALOG_EXPORT_DIR=` copied from .env.example)
+    # means unset, not the current directory.
+    raw = (os.environ.get(key) or "").strip()
+    return Path(raw) if raw else Path(default)
+
+
 def _database_from_url(database_url: str):
     """
     Minimal DATABASE_URL parser.
@@ -155,6 +163,23 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; point to a shared backend (Redis, Memcached) when
+# running several worker processes so catalog versions stay consistent.
+# DatabaseCache also works but turns every catalog version read and suggest
+# lookup into a query: prefer django.core.cache.backends.redis.RedisCache.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "noor-patisserie"),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -191,6 +216,27 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files and generated product image derivatives.
+# DJANGO_MEDIA_URL may be an absolute URL (CDN, backend domain) since the
+# storefront is served from another origin.
+MEDIA_URL = os.environ.get("DJANGO_MEDIA_URL", "/media/")
+MEDIA_ROOT = _env_path("DJANGO_MEDIA_ROOT", BASE_DIR / "media")
+
+# Product image pipeline (catalog/images.py). Off unless enabled: it starts a
+# pool of worker processes on the first product save (set it in deployment;
+# `build_image_derivatives` backfills images saved while it was off).
+CATALOG_IMAGE_PIPELINE = _env_bool("CATALOG_IMAGE_PIPELINE", False)
+CATALOG_IMAGE_WIDTHS = [
+    int(w) for w in _env_list("CATALOG_IMAGE_WIDTHS", ["320", "640", "960"])
+]
+CATALOG_IMAGE_WORKERS = int(os.environ.get("CATALOG_IMAGE_WORKERS", "2"))
+# Static catalog snapshot (catalog/export.py, `export_catalog` command)
+CATALOG_EXPORT_DIR = _env_path("CATALOG_EXPORT_DIR", BASE_DIR / "catalog_export")
+CATALOG_EXPORT_ON_CHANGE = _env_bool("CATALOG_EXPORT_ON_CHANGE", False)
+CATALOG_EXPORT_DELAY = float(os.environ.get("CATALOG_EXPORT_DELAY", "2"))
+# Frontend public/ directory, where image_url values like "/catalog/x.png" live
+CATALOG_PUBLIC_DIR = _env_path("CATALOG_PUBLIC_DIR", BASE_DIR.parent / "frontend" / "public")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -260,6 +306,35 @@ SIMPLE_JWT = {
 STRIPE_PUBLIC_KEY = os.environ.get("STRIPE_PUBLIC_KEY", "")
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
+# How long a Checkout session verified with Stripe is trusted by the success-page poll (seconds)
+STRIPE_SESSION_CACHE_TTL = int(os.environ.get("STRIPE_SESSION_CACHE_TTL", "86400"))
+# Shared Stripe client (payments/stripe_client.py): keep-alive connections kept per
+# process (about the request threads of a worker), timeouts (seconds) and network
+# retries of idempotent calls
+STRIPE_HTTP_POOL_SIZE = int(os.environ.get("STRIPE_HTTP_POOL_SIZE", "10"))
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get("STRIPE_CONNECT_TIMEOUT", "3"))
+STRIPE_READ_TIMEOUT = float(os.environ.get("STRIPE_READ_TIMEOUT", "15"))
+STRIPE_MAX_NETWORK_RETRIES = int(os.environ.get("STRIPE_MAX_NETWORK_RETRIES", "2"))
+# Stock is held this long for a pending checkout (seconds); Stripe sessions expire
+# at the same time, 30 minutes being the shortest expiry Stripe accepts
+STOCK_RESERVATION_TTL = int(os.environ.get("STOCK_RESERVATION_TTL", "1800"))
+# Stripe events are applied by the `process_webhook_events` worker instead of
+# the webhook request. The worker needs a shared cache and ORDER_EVENTS_BROKER
+# (e.g. orders.events.PostgresBroker, checked at startup): catalog invalidation
+# and order status updates must reach the web processes. Without the worker, a
+# failed event gets a 500 so that Stripe redelivers it.
+WEBHOOK_WORKER = _env_bool("WEBHOOK_WORKER", False)
+# Webhook inbox worker: attempts before an event is dead-lettered, and retry
+# backoff (seconds, doubled after each failure up to the max)
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_DELAY = int(os.environ.get("WEBHOOK_RETRY_DELAY", "30"))
+WEBHOOK_RETRY_MAX_DELAY = int(os.environ.get("WEBHOOK_RETRY_MAX_DELAY", "3600"))
+
+# Live order status stream (/api/orders/<id>/events/, needs the ASGI app)
+ORDER_EVENTS_BROKER = os.environ.get("ORDER_EVENTS_BROKER", "orders.events.InProcessBroker")
+ORDER_EVENTS_HEARTBEAT = float(os.environ.get("ORDER_EVENTS_HEARTBEAT", "15"))
+# Streams are closed after this many seconds; the success page then polls the order
+ORDER_EVENTS_MAX_DURATION = float(os.environ.get("ORDER_EVENTS_MAX_DURATION", "600"))
 
 # Frontend base URL (used for Stripe redirects)
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://127.0.0.1:3000")
@@ -267,6 +342,12 @@ FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://127.0.0.1:3000")
 # Email (console backend for development)
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@example.com')
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+# Outbox sender (send_outbound_emails): attempts before a message is dead-lettered,
+# retry backoff (seconds, doubled up to the max) and messages per second (0 = no limit)
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get('EMAIL_OUTBOX_RETRY_DELAY', '60'))
+EMAIL_OUTBOX_RETRY_MAX_DELAY = int(os.environ.get('EMAIL_OUTBOX_RETRY_MAX_DELAY', '3600'))
+EMAIL_OUTBOX_RATE = float(os.environ.get('EMAIL_OUTBOX_RATE', '10'))
 
 # Basic logging configuration to ensure webhook logs appear on console during development
 LOGGING = {
@@ -0,0 +1,161 @@
+"""
+Sparse fieldsets for the API serializers: `?fields=` and `?expand=`.
+
+- `?fields=id,name,price` keeps only those fields; nested fields use dotted
+  paths (`?fields=id,items.quantity,items.product_name`).
+- `?expand=category` embeds a relation as a nested object; relations that are
+  not expanded are rendered as their primary key once `fields` or `expand`
+  is given (`?expand=items.product.category` for deeper levels).
+- Without either parameter the full legacy representation is returned.
+
+`restrict_queryset()` turns the same selection into `.only()` /
+`.select_related()` so unneeded columns and joins are not fetched.
+"""
+from rest_framework import serializers
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+def _parse(raw) -> set[str]:
+    return {part.strip() for part in raw.split(",") if part.strip()}
+
+
+def sparse_spec(request):
+    """
+    (only, expand) requested by `request`; each is a set of dotted paths or
+    None (None for `only` = every field, for `expand` = every relation).
+    """
+    if request is None:
+        return None, None
+    params = request.query_params
+    only = _parse(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+    if EXPAND_PARAM in params:
+        expand = _parse(params[EXPAND_PARAM])
+    else:
+        expand = None if only is None else set()
+    return only, expand
+
+
+def _top(paths) -> set[str]:
+    return {path.split(".", 1)[0] for path in paths}
+
+
+def _sub(paths, name):
+    """Paths below `name` (None when the whole sub-tree is selected)."""
+    if paths is None or name in paths:
+        return None
+    prefix = f"{name}."
+    return {path[len(prefix):] for path in paths if path.startswith(prefix)}
+
+
+def _sub_expand(expand, name):
+    if expand is None:
+        return None
+    prefix = f"{name}."
+    return {path[len(prefix):] for path in expand if path.startswith(prefix)}
+
+
+def selects(only, name) -> bool:
+    """Whether top-level field `name` is part of the `only` selection."""
+    return only is None or name in _top(only)
+
+
+def nested_selection(only, expand, name):
+    """(only, expand) for the serializer nested under `name`."""
+    return _sub(only, name), _sub_expand(expand, name)
+
+
+class SparseFieldsetMixin:
+    """
+    ModelSerializer mixin honouring `?fields=` / `?expand=`.
+
+    `expandable_fields` lists the relation fields that collapse to a primary
+    key when not expanded; `field_sources` maps fields that are not plain
+    model fields (method fields...) to the model fields they read, for
+    `restrict_queryset()`.
+    """
+
+    expandable_fields: tuple[str, ...] = ()
+    field_sources: dict[str, tuple[str, ...]] = {}
+
+    def _sparse_selection(self):
+        selection = getattr(self, "_sparse", None)
+        if selection is not None:
+            return selection
+        root = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        if root is not None:
+            return None, None
+        return sparse_spec(self.context.get("request"))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self._sparse_selection()
+
+        if only is not None:
+            wanted = _top(only)
+            for name in list(fields):
+                if name not in wanted:
+                    del fields[name]
+
+        for name in self.expandable_fields:
+            if name in fields and expand is not None and name not in _top(expand):
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+        for name, field in fields.items():
+            nested = getattr(field, "child", field)
+            if isinstance(nested, SparseFieldsetMixin):
+                nested._sparse = nested_selection(only, expand, name)
+        return fields
+
+
+def plan_columns(serializer_class, only, expand, prefix=""):
+    """
+    (columns, joins) needed to render `serializer_class` for this selection,
+    as `.only()` and `.select_related()` arguments. Reverse/many relations
+    (e.g. order items) are left to the caller (Prefetch).
+    """
+    model = serializer_class.Meta.model
+    columns = [prefix + model._meta.pk.name]
+    joins = []
+    wanted = _top(only) if only is not None else None
+
+    for name in serializer_class.Meta.fields:
+        if wanted is not None and name not in wanted:
+            continue
+        declared = serializer_class._declared_fields.get(name)
+        nested = getattr(declared, "child", declared)
+
+        if name in serializer_class.expandable_fields:
+            columns.append(prefix + name)
+            if expand is None or name in _top(expand):
+                joins.append(prefix + name)
+                sub_columns, sub_joins = plan_columns(
+                    type(nested), *nested_selection(only, expand, name), prefix=f"{prefix}{name}__"
+                )
+                columns += sub_columns
+                joins += sub_joins
+            continue
+        if isinstance(nested, serializers.BaseSerializer):
+            continue
+
+        sources = serializer_class.field_sources.get(name)
+        if sources is None:
+            source = getattr(declared, "source", None) or name
+            sources = (source.replace(".", "__"),)
+        for source in sources:
+            columns.append(prefix + source)
+            if "__" in source:
+                joins.append(prefix + source.rsplit("__", 1)[0])
+    return columns, joins
+
+
+def restrict_queryset(queryset, serializer_class, only, expand, extra_columns=()):
+    """Apply `.only()`/`.select_related()` matching a sparse selection (no-op for full output)."""
+    if only is None and expand is None:
+        return queryset
+    columns, joins = plan_columns(serializer_class, only, expand)
+    queryset = queryset.select_related(None)
+    if joins:
+        queryset = queryset.select_related(*joins)
+    return queryset.only(*columns, *extra_columns)
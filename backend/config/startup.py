@@ -8,11 +8,13 @@ logger = logging.getLogger(__name__)
 
 def run_startup_tasks() -> None:
     """
-    Run database migrations and seed the Ramadan catalog on startup.
+    Run database migrations, create the database cache table (when
+    DJANGO_CACHE_BACKEND is DatabaseCache) and seed the Ramadan catalog on startup.
 
     This is used on Render free instances where we don't have Shell / pre-deploy
     commands. It is safe to run multiple times:
     - `migrate` is idempotent
+    - `createcachetable` skips existing tables
     - `seed_ramadan_catalog` command was written to be idempotent
     """
 
@@ -21,8 +23,9 @@ def run_startup_tasks() -> None:
         return
 
     try:
-        logger.info("Running startup tasks: migrate + seed_ramadan_catalog")
+        logger.info("Running startup tasks: migrate + createcachetable + seed_ramadan_catalog")
         call_command("migrate", interactive=False)
+        call_command("createcachetable")
         call_command("seed_ramadan_catalog")
         logger.info("Startup tasks completed successfully.")
     except Exception:
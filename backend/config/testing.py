@@ -0,0 +1,59 @@
+"""Test helpers shared by the app test suites."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+def _format_queries(context) -> str:
+    return "\n".join(
+        f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1)
+    )
+
+
+@contextmanager
+def query_budget(max_queries: int, using: str = DEFAULT_DB_ALIAS):
+    """
+    Fail when the wrapped block runs more than `max_queries` queries.
+
+        with query_budget(3):
+            self.client.get(url)
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    if len(context) > max_queries:
+        raise AssertionError(
+            f"{len(context)} queries executed, budget is {max_queries}:\n{_format_queries(context)}"
+        )
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin asserting that an endpoint's query count does not grow
+    with the size of its result (the classic N+1 regression).
+    """
+
+    def assertConstantQueries(self, fetch, grow, max_queries=None, rounds=2, using=DEFAULT_DB_ALIAS):
+        """
+        Call `fetch()`, then alternately `grow()` and `fetch()` `rounds` times.
+        No later `fetch()` may run more queries than the first one (nor more
+        than `max_queries` when given). `fetch` should assert on its own response.
+        """
+        counts = []
+        for round_ in range(rounds + 1):
+            if round_:
+                grow()
+            with CaptureQueriesContext(connections[using]) as context:
+                fetch()
+            counts.append(len(context))
+            if max_queries is not None and len(context) > max_queries:
+                self.fail(
+                    f"{len(context)} queries executed, budget is {max_queries}:\n"
+                    f"{_format_queries(context)}"
+                )
+            if counts[-1] > counts[0]:
+                self.fail(
+                    f"Query count grows with result size ({' -> '.join(map(str, counts))}):\n"
+                    f"{_format_queries(context)}"
+                )
+        return counts[0]
@@ -1,3 +1,29 @@
 from django.contrib import admin
 
-# Register your models here.
+from .export import export_response
+from .models import Order, OrderItem
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    raw_id_fields = ("product",)
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "total_amount", "item_count", "created_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("id", "user__email", "stripe_session_id", "stripe_payment_intent_id")
+    date_hierarchy = "created_at"
+    list_select_related = ("user",)
+    inlines = [OrderItemInline]
+    actions = ["export_csv", "export_jsonl"]
+
+    @admin.action(description="Exporter pour la comptabilité (CSV)")
+    def export_csv(self, request, queryset):
+        return export_response(request, queryset, "csv")
+
+    @admin.action(description="Exporter pour la comptabilité (JSONL)")
+    def export_jsonl(self, request, queryset):
+        return export_response(request, queryset, "jsonl")
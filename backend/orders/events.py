@@ -0,0 +1,162 @@
+"""
+Order status pub/sub for the live order stream (`/api/orders/<id>/events/`).
+
+The broker is chosen with the ORDER_EVENTS_BROKER setting: a dotted path to a
+class with `publish(order_id, payload)` and an async-context `subscribe(order_id)`
+yielding an object whose `await get()` returns the next payload. The default
+in-process broker only reaches clients connected to the same process: with
+several workers, or when webhooks are applied by the `process_webhook_events`
+worker, use `PostgresBroker` (LISTEN/NOTIFY), or plug another pub/sub (Redis...)
+behind the same interface.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBroker:
+    """
+    asyncio queues per subscriber. `publish` may be called from any thread
+    (sync views run in a worker thread under ASGI): payloads are handed to each
+    subscriber's event loop with `call_soon_threadsafe`.
+    """
+
+    # Publishers in another process are never heard
+    process_local = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[int, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(self, order_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(order_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, payload)
+            except RuntimeError:
+                # Loop already closed: the client is gone.
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, order_id):
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(order_id, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(order_id)
+                if subscribers is not None:
+                    subscribers.discard(entry)
+                    if not subscribers:
+                        del self._subscribers[order_id]
+
+    def subscriber_count(self, order_id) -> int:
+        with self._lock:
+            return len(self._subscribers.get(order_id, ()))
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    PostgreSQL LISTEN/NOTIFY. `publish` sends a NOTIFY through the default
+    database, which the server delivers to every process; each process runs
+    one listener thread on a connection of its own (started with the first
+    subscriber) and hands the payloads to its local subscribers. Waiting
+    streams cost no query. Needs PostgreSQL with psycopg2. A notification
+    sent while the listener reconnects is lost; the success page then falls
+    back to polling.
+    """
+
+    process_local = False
+    database_vendor = "postgresql"
+    channel = "order_events"
+    # Seconds between liveness checks of the listening connection
+    listen_timeout = 30
+    reconnect_delay = 5
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+        self._listening = threading.Event()
+        self._listener_lock = threading.Lock()
+
+    def publish(self, order_id, payload):
+        message = json.dumps({"order_id": order_id, "payload": payload})
+        with connections["default"].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, message])
+
+    def dispatch(self, message: str) -> None:
+        """Hand a NOTIFY payload to this process's subscribers."""
+        data = json.loads(message)
+        super().publish(data["order_id"], data["payload"])
+
+    def _ensure_listener(self) -> None:
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listening.clear()
+                self._listener = threading.Thread(target=self._listen, name="order-events-listener", daemon=True)
+                self._listener.start()
+        # Updates published before LISTEN runs would be missed
+        self._listening.wait(timeout=self.reconnect_delay)
+
+    def _listen(self) -> None:
+        wrapper = connections["default"]
+        while True:
+            conn = None
+            try:
+                conn = wrapper.Database.connect(**wrapper.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                self._listening.set()
+                while True:
+                    if select.select([conn], [], [], self.listen_timeout) == ([], [], []):
+                        # Idle: make sure the connection is still there
+                        with conn.cursor() as cursor:
+                            cursor.execute("SELECT 1")
+                    conn.poll()
+                    while conn.notifies:
+                        self.dispatch(conn.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Order events listener failed; reconnecting in %ss", self.reconnect_delay)
+                self._listening.clear()
+                time.sleep(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    @asynccontextmanager
+    async def subscribe(self, order_id):
+        await asyncio.to_thread(self._ensure_listener)
+        async with super().subscribe(order_id) as queue:
+            yield queue
+
+
+order_events = SimpleLazyObject(lambda: import_string(settings.ORDER_EVENTS_BROKER)())
+
+
+@receiver(setting_changed)
+def _reset_broker(setting, **kwargs):
+    # Tests overriding ORDER_EVENTS_BROKER get a broker built from it
+    if setting == "ORDER_EVENTS_BROKER":
+        order_events._wrapped = empty
+
+
+def publish_order_status(order):
+    """Notify live streams that `order` changed status."""
+    order_events.publish(order.id, {"id": order.id, "status": order.status})
@@ -0,0 +1,91 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from catalog.models import Category, Product
+from orders.models import Order, OrderItem
+from orders.serializers import OrderListSerializer, OrderSummarySerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-row order history path with Order.objects.with_items() "
+        "and the summary-only list (orders are created in a transaction and rolled back)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=1000, help="Orders per user.")
+        parser.add_argument("--items", type=int, default=3, help="Items per order.")
+        parser.add_argument("--users", type=int, default=2)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options["orders"], options["items"], options["users"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, orders_per_user, items_per_order, users):
+        products = self._seed_products(items_per_order * 4)
+        customers = [
+            User.objects.create_user(f"bench-{i}@example.com", f"bench-{i}@example.com")
+            for i in range(users)
+        ]
+        for user in customers:
+            orders = Order.objects.bulk_create(
+                Order(user=user, status="paid", total_amount=Decimal("0")) for _ in range(orders_per_user)
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order,
+                    product=products[(n + k) % len(products)],
+                    quantity=1 + k,
+                    price=products[(n + k) % len(products)].price,
+                )
+                for n, order in enumerate(orders)
+                for k in range(items_per_order)
+            )
+
+        user = customers[0]
+        self.stdout.write(
+            f"{orders_per_user} orders x {items_per_order} items for one of {users} users"
+        )
+        self.stdout.write(f"{'path':>12} {'queries':>8} {'time':>10}")
+        for label, queryset, serializer_class in (
+            ("per-row", Order.objects.filter(user=user), OrderListSerializer),
+            ("with_items", Order.objects.with_items().filter(user=user), OrderListSerializer),
+            ("summary", Order.objects.filter(user=user), OrderSummarySerializer),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                JSONRenderer().render(serializer_class(queryset, many=True).data)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:>12} {len(queries):>8} {elapsed * 1000:>8.1f}ms")
+
+    @staticmethod
+    def _seed_products(count):
+        # bulk_create skips the catalog signals: nothing leaks into the
+        # in-memory indexes once the transaction is rolled back.
+        categories = Category.objects.bulk_create(
+            Category(name=f"Bench — catégorie {i}", slug=f"bench-history-{i}") for i in range(4)
+        )
+        return Product.objects.bulk_create(
+            Product(
+                category=categories[i % len(categories)],
+                name=f"Pâtisserie n°{i:03d}",
+                slug=f"bench-history-product-{i}",
+                price=Decimal("8.50") + i,
+                stock=100,
+            )
+            for i in range(count)
+        )
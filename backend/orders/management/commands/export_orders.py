@@ -0,0 +1,62 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.export import DEFAULT_CHUNK_SIZE, FORMATS, encode_rows, export_rows, gzip_chunks, orders_in_range
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r} (expected YYYY-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Export orders and their items (one row per item) created in a date range, "
+        "as CSV or JSON Lines, optionally gzip-compressed. Output is streamed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First day included (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", help="Last day included (YYYY-MM-DD).")
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--status", help="Only orders with this status (e.g. paid).")
+        parser.add_argument(
+            "--output", default="-", help="Target file ('-' for stdout). A .gz suffix enables gzip."
+        )
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        start = _date(options["start"]) if options["start"] else None
+        end = _date(options["end"]) if options["end"] else None
+        if start and end and start > end:
+            raise CommandError("--from must not be after --to.")
+
+        orders = orders_in_range(start, end)
+        if options["status"]:
+            orders = orders.filter(status=options["status"])
+
+        output = options["output"]
+        compress = options["gzip"] or output.endswith(".gz")
+        chunks = encode_rows(export_rows(orders, chunk_size=options["chunk_size"]), options["format"])
+        if compress:
+            chunks = gzip_chunks(chunks)
+
+        written = 0
+        target = sys.stdout.buffer if output == "-" else open(output, "wb")
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+            else:
+                target.flush()
+
+        if output != "-":
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {output}."))
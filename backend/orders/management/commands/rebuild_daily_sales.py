@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.reports import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = "Recompute the DailyProductSales rollup from paid orders."
+
+    def handle(self, *args, **options):
+        count = rebuild_daily_sales()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily product sales rows."))
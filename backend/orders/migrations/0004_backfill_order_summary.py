@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def backfill_order_summary(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+
+    items = OrderItem.objects.select_related("product").order_by("id")
+    orders = Order.objects.prefetch_related(models.Prefetch("items", queryset=items)).order_by("id")
+    batch = []
+    for order in orders.iterator(chunk_size=500):
+        lines = list(order.items.all())
+        first = lines[0].product if lines else None
+        order.item_count = sum(line.quantity for line in lines)
+        order.first_item_name = first.name if first else ""
+        order.first_item_image_url = first.image_url if first else ""
+        batch.append(order)
+        if len(batch) >= 500:
+            Order.objects.bulk_update(batch, ["item_count", "first_item_name", "first_item_image_url"])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ["item_count", "first_item_name", "first_item_image_url"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_order_summary"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    DailyProductSales = apps.get_model("orders", "DailyProductSales")
+
+    # Payment time was not recorded before: the last update of a paid order is the best estimate.
+    Order.objects.filter(status="paid", paid_at__isnull=True).update(paid_at=F("updated_at"))
+
+    rows = (
+        OrderItem.objects.filter(order__status="paid")
+        .annotate(day=TruncDate("order__paid_at"))
+        .values("day", "product_id")
+        .annotate(units=Sum("quantity"), revenue=Sum(F("price") * F("quantity")), orders=Count("id"))
+        .order_by()
+    )
+    DailyProductSales.objects.bulk_create(
+        (
+            DailyProductSales(
+                day=row["day"],
+                product_id=row["product_id"],
+                units=row["units"],
+                revenue=row["revenue"],
+                order_count=row["orders"],
+            )
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_daily_product_sales"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
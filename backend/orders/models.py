@@ -2,6 +2,20 @@ from django.db import models
 from django.contrib.auth.models import User
 from catalog.models import Product
 
+DEFAULT_CURRENCY = 'eur'
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self, items=None):
+        """
+        Prefetch items (by default with product and category joined), so an order
+        history page costs two queries however many orders and items it holds.
+        """
+        if items is None:
+            items = OrderItem.objects.select_related("product__category")
+        return self.prefetch_related(models.Prefetch("items", queryset=items))
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'En attente de paiement'),
@@ -16,16 +30,40 @@ class Order(models.Model):
     
     stripe_session_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
     stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    paid_at = models.DateTimeField(blank=True, null=True)
     
+    # Summary shown in order history lists without loading the items (see `set_summary`)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    item_count = models.PositiveIntegerField(default=0)
+    first_item_name = models.CharField(max_length=255, blank=True, default='')
+    first_item_image_url = models.CharField(max_length=500, blank=True, default='')
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history: a user's orders newest first; id breaks created_at ties (keyset pagination)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.user.email} - {self.status}"
 
+    def set_summary(self, items):
+        """
+        Fill the summary fields from `items` (order items with their product, in
+        cart order). `item_count` is the number of articles, not of lines. Does not save.
+        """
+        items = list(items)
+        first = items[0].product if items else None
+        self.item_count = sum(item.quantity for item in items)
+        self.first_item_name = first.name if first else ''
+        self.first_item_image_url = first.image_url if first else ''
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -38,3 +76,24 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+
+class DailyProductSales(models.Model):
+    """
+    Sales of paid orders per product and day of payment (local date), maintained
+    by fulfillment with F() increments; `rebuild_daily_sales` recomputes it.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='daily_sales_day_product_uniq'),
+        ]
+        ordering = ['-day', 'product']
+
+    def __str__(self):
+        return f"{self.day} - {self.product_id}: {self.units}"
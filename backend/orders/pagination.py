@@ -0,0 +1,9 @@
+from catalog.pagination import KeysetPagination
+
+
+class OrderKeysetPagination(KeysetPagination):
+    """Newest orders first; served from the (user, -created_at) index."""
+
+    ordering = ("-created_at", "-id")
+    default_limit = 20
+    max_limit = 50
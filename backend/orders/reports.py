@@ -0,0 +1,125 @@
+"""
+Sales reporting from the DailyProductSales rollup. The rollup holds one row
+per product and day, so reports cost the same whatever the order volume.
+"""
+from itertools import batched
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, OrderItem
+
+# Rollup rows loaded and inserted at a time by rebuild_daily_sales()
+ROLLUP_CHUNK_SIZE = 1000
+
+
+def _increment(day, totals):
+    """Add `totals` ({product_id: (units, revenue)}) to existing rows in one UPDATE; returns the rows updated."""
+    def per_product(field, values):
+        return Case(
+            *(When(product_id=product_id, then=F(field) + value) for product_id, value in values),
+            default=F(field),
+            output_field=DailyProductSales._meta.get_field(field),
+        )
+
+    return DailyProductSales.objects.filter(day=day, product_id__in=totals).update(
+        units=per_product("units", ((product_id, units) for product_id, (units, _) in totals.items())),
+        revenue=per_product("revenue", ((product_id, revenue) for product_id, (_, revenue) in totals.items())),
+        order_count=F("order_count") + 1,
+    )
+
+
+def record_daily_sales(order, items):
+    """
+    Add a freshly paid order to the rollup (day = local date of `order.paid_at`)
+    in a constant number of queries. Concurrent fulfillments are safe: rows are
+    bumped with F() increments, and when another order creates a missing row
+    first, the lines are retried as increments.
+    """
+    day = timezone.localdate(order.paid_at)
+    totals = {}
+    for item in items:
+        units, revenue = totals.get(item.product_id, (0, 0))
+        totals[item.product_id] = (units + item.quantity, revenue + item.price * item.quantity)
+    if not totals:
+        return
+
+    existing = set(
+        DailyProductSales.objects.filter(day=day, product_id__in=totals).values_list("product_id", flat=True)
+    )
+    if existing:
+        _increment(day, {product_id: totals[product_id] for product_id in existing})
+    missing = {product_id: total for product_id, total in totals.items() if product_id not in existing}
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            DailyProductSales.objects.bulk_create(
+                DailyProductSales(day=day, product_id=product_id, units=units, revenue=revenue, order_count=1)
+                for product_id, (units, revenue) in missing.items()
+            )
+    except IntegrityError:
+        # Some rows were created concurrently: increment those, create the others
+        for product_id, total in missing.items():
+            if _increment(day, {product_id: total}):
+                continue
+            units, revenue = total
+            DailyProductSales.objects.create(
+                day=day, product_id=product_id, units=units, revenue=revenue, order_count=1
+            )
+
+
+@transaction.atomic
+def rebuild_daily_sales():
+    """Recompute the whole rollup from paid orders; returns the number of rows."""
+    DailyProductSales.objects.all().delete()
+    # Dates are truncated in the current time zone, like timezone.localdate().
+    rows = (
+        OrderItem.objects.filter(order__status="paid", order__paid_at__isnull=False)
+        .annotate(day=TruncDate("order__paid_at", tzinfo=timezone.get_current_timezone()))
+        .values("day", "product_id")
+        .annotate(
+            total_units=Sum("quantity"),
+            total_revenue=Sum(F("price") * F("quantity")),
+            orders=Count("id"),  # one item per product and order
+        )
+        .order_by()
+    )
+    # bulk_create() materializes its input: insert chunk by chunk so memory
+    # stays bounded by the chunk size, not the number of rollup rows.
+    created = 0
+    for chunk in batched(rows.iterator(chunk_size=ROLLUP_CHUNK_SIZE), ROLLUP_CHUNK_SIZE):
+        DailyProductSales.objects.bulk_create(
+            DailyProductSales(
+                day=row["day"],
+                product_id=row["product_id"],
+                units=row["total_units"],
+                revenue=row["total_revenue"],
+                order_count=row["orders"],
+            )
+            for row in chunk
+        )
+        created += len(chunk)
+    return created
+
+
+def top_products(start, end, limit=10):
+    """Best sellers by units between two days (inclusive)."""
+    return list(
+        DailyProductSales.objects.filter(day__range=(start, end))
+        .values("product_id", name=F("product__name"), slug=F("product__slug"))
+        .annotate(units=Sum("units"), revenue=Sum("revenue"), orders=Sum("order_count"))
+        .order_by("-units", "-revenue", "product_id")[:limit]
+    )
+
+
+def daily_revenue(start, end):
+    """Revenue and units per day between two days (inclusive); days without sales are omitted."""
+    return list(
+        DailyProductSales.objects.filter(day__range=(start, end))
+        .values("day")
+        .annotate(revenue=Sum("revenue"), units=Sum("units"))
+        .order_by("day")
+    )
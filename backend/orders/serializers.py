@@ -1,18 +1,21 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
 from catalog.serializers import ProductSerializer
+from config.sparse import SparseFieldsetMixin
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_name = serializers.CharField(source="product.name", read_only=True)
 
+    expandable_fields = ("product",)
+
     class Meta:
         model = OrderItem
         fields = ["id", "product", "product_name", "quantity", "price"]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
@@ -29,10 +32,42 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user", "created_at", "updated_at"]
 
 
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Light serializer for list (no user)."""
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         fields = ["id", "status", "total_amount", "items", "created_at"]
+
+
+class OrderSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Order history row from the denormalized summary fields (no items loaded)."""
+
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "status",
+            "total_amount",
+            "currency",
+            "item_count",
+            "first_item_name",
+            "first_item_image_url",
+            "created_at",
+        ]
+
+
+class TopProductSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    name = serializers.CharField()
+    slug = serializers.CharField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    orders = serializers.IntegerField()
+
+
+class DailyRevenueSerializer(serializers.Serializer):
+    day = serializers.DateField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    units = serializers.IntegerField()
@@ -1,3 +1,386 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from catalog.models import Category, Product
+from config.testing import QueryBudgetMixin
+
+from .events import PostgresBroker, order_events
+from .models import DailyProductSales, Order, OrderItem
+from .reports import rebuild_daily_sales
+
+
+class OrderQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Order endpoints must load items, products and categories in bulk."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.created = 0
+        self.order = self.add_order(items=2)
+
+    def add_order(self, items=3):
+        order = Order.objects.create(user=self.user, total_amount=Decimal("0"))
+        for _ in range(items):
+            index = self.created
+            category = Category.objects.create(name=f"Catégorie {index}", slug=f"categorie-{index}")
+            product = Product.objects.create(
+                category=category,
+                name=f"Dattes n°{index}",
+                slug=f"dattes-{index}",
+                price=Decimal("9.90"),
+                stock=5,
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+            self.created += 1
+        return order
+
+    def grow(self):
+        self.add_order()
+        for _ in range(3):
+            self.add_item(self.order)
+
+    def add_item(self, order):
+        index = self.created
+        category = Category.objects.create(name=f"Catégorie {index}", slug=f"categorie-{index}")
+        product = Product.objects.create(
+            category=category, name=f"Kunafa n°{index}", slug=f"kunafa-{index}", price=Decimal("14.50")
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=2, price=product.price)
+        self.created += 1
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_order_list(self):
+        self.assertConstantQueries(lambda: self.get("/api/orders/"), self.grow, max_queries=1)
+
+    def test_order_detail(self):
+        self.assertConstantQueries(lambda: self.get(f"/api/orders/{self.order.pk}/"), self.grow, max_queries=2)
+
+    def test_order_list_paginated(self):
+        self.assertConstantQueries(
+            lambda: self.get("/api/orders/", limit=2, status="pending"), self.grow, max_queries=1
+        )
+
+    def test_order_list_pages(self):
+        for _ in range(4):
+            self.add_order(items=1)
+        Order.objects.filter(pk=self.order.pk).update(status="paid")
+        seen, url, params = [], "/api/orders/", {"limit": 2, "status": "pending"}
+        while url:
+            page = self.get(url, **params).json()
+            seen += [order["id"] for order in page["results"]]
+            url, params = page["next"], {}
+        pending = Order.objects.filter(status="pending").order_by("-created_at", "-id")
+        expected = list(pending.values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 4)
+
+    def test_order_list_invalid_status(self):
+        self.assertEqual(self.client.get("/api/orders/", {"status": "shipped"}).status_code, 400)
+
+    def test_order_detail_sparse_fieldset(self):
+        url = f"/api/orders/{self.order.pk}/"
+        fetch = lambda: self.get(url, fields="id,status,items.product_name,items.quantity")
+        self.assertConstantQueries(fetch, self.grow, max_queries=2)
+        item = fetch().json()["items"][0]
+        self.assertEqual(set(item), {"product_name", "quantity"})
+
+    def test_order_detail_without_items(self):
+        fetch = lambda: self.get(f"/api/orders/{self.order.pk}/", fields="id,total_amount")
+        self.assertConstantQueries(fetch, self.grow, max_queries=1)
+
+    def test_order_detail_expand(self):
+        fetch = lambda: self.get(f"/api/orders/{self.order.pk}/", expand="items.product")
+        self.assertConstantQueries(fetch, self.grow, max_queries=2)
+        item = fetch().json()["items"][0]
+        self.assertIsInstance(item["product"]["category"], int)
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_dummy")
+    def test_order_by_checkout_session(self):
+        self.order.stripe_session_id = "cs_test_123"
+        self.order.save()
+        session = {"id": "cs_test_123", "metadata": {"order_id": str(self.order.pk)}}
+        with mock.patch("payments.stripe_client.retrieve_checkout", return_value=session):
+            self.assertConstantQueries(
+                lambda: self.get("/api/orders/by-checkout-session/", session_id="cs_test_123"),
+                self.grow,
+                max_queries=2,
+            )
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test_dummy")
+class CheckoutSessionLookupTests(TestCase):
+    """The success-page poll only asks Stripe until the order is paid."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.order = Order.objects.create(user=user, total_amount=Decimal("12.00"), stripe_session_id="cs_test_poll")
+        self.session = {"id": "cs_test_poll", "metadata": {"order_id": str(self.order.pk)}}
+
+    def poll(self, session_id="cs_test_poll"):
+        return self.client.get("/api/orders/by-checkout-session/", {"session_id": session_id})
+
+    def test_paid_order_verified_once(self):
+        Order.objects.filter(pk=self.order.pk).update(status="paid")
+        with mock.patch("payments.stripe_client.retrieve_checkout", return_value=self.session) as retrieve:
+            for _ in range(3):
+                self.assertEqual(self.poll().status_code, 200)
+        retrieve.assert_called_once_with("cs_test_poll")
+
+    def test_pending_order_verified_on_every_poll(self):
+        with mock.patch("payments.stripe_client.retrieve_checkout", return_value=self.session) as retrieve:
+            self.poll()
+            self.poll()
+        self.assertEqual(retrieve.call_count, 2)
+
+    def test_unknown_session_skips_stripe(self):
+        with mock.patch("payments.stripe_client.retrieve_checkout") as retrieve:
+            self.assertEqual(self.poll("cs_test_unknown").status_code, 404)
+        retrieve.assert_not_called()
+
+    def test_session_for_another_order(self):
+        session = {"id": "cs_test_poll", "metadata": {"order_id": str(self.order.pk + 1)}}
+        with mock.patch("payments.stripe_client.retrieve_checkout", return_value=session):
+            self.assertEqual(self.poll().status_code, 404)
+
+
+class OrderSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Coffrets", slug="coffrets")
+        self.products = [
+            Product.objects.create(
+                category=category,
+                name=name,
+                slug=f"coffret-{i}",
+                price=Decimal("12.00"),
+                stock=10,
+                image_url=f"/catalog/coffret_{i}.png",
+            )
+            for i, name in enumerate(["Coffret dattes", "Coffret baklawa"])
+        ]
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_dummy")
+    def test_checkout_fills_summary(self):
+        session = mock.Mock(id="cs_test_summary", url="https://checkout.stripe.test/cs_test_summary")
+        items = [
+            {"id": self.products[0].pk, "name": "Coffret dattes", "price": 12, "quantity": 2},
+            {"id": self.products[1].pk, "name": "Coffret baklawa", "price": 12, "quantity": 1},
+        ]
+        with mock.patch("payments.stripe_client.create_checkout", return_value=session):
+            response = self.client.post("/api/payments/create-checkout-session/", {"items": items}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        row = self.client.get("/api/orders/").json()[0]
+        self.assertEqual(row["item_count"], 3)
+        self.assertEqual(row["first_item_name"], "Coffret dattes")
+        self.assertEqual(row["first_item_image_url"], "/catalog/coffret_0.png")
+        self.assertEqual(row["currency"], "eur")
+        self.assertNotIn("items", row)
+
+
+class OrderEventsStreamTests(TestCase):
+    """SSE stream of an order's status."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.order = Order.objects.create(user=self.user, total_amount=Decimal("12.00"), stripe_session_id="cs_test_sse")
+        self.url = f"/api/orders/{self.order.pk}/events/"
+
+    async def read_events(self, response):
+        events = []
+        async for chunk in response.streaming_content:
+            events += [line[len("data: "):] for line in chunk.decode().splitlines() if line.startswith("data: ")]
+        return events
+
+    async def test_paid_order_single_event(self):
+        await Order.objects.filter(pk=self.order.pk).aupdate(status="paid")
+        response = await self.async_client.get(self.url, {"session_id": "cs_test_sse"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(await self.read_events(response), [f'{{"id": {self.order.pk}, "status": "paid"}}'])
+
+    async def test_pending_order_receives_update(self):
+        response = await self.async_client.get(self.url, {"session_id": "cs_test_sse"})
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'"status": "pending"', await anext(stream))
+        self.assertEqual(order_events.subscriber_count(self.order.pk), 1)
+
+        order_events.publish(self.order.pk, {"id": self.order.pk, "status": "paid"})
+        self.assertIn(b'"status": "paid"', await anext(stream))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(order_events.subscriber_count(self.order.pk), 0)
+
+    async def test_owner_token(self):
+        await Order.objects.filter(pk=self.order.pk).aupdate(status="paid")
+        token = str(AccessToken.for_user(self.user))
+        response = await self.async_client.get(self.url, headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_wsgi_sends_current_status_and_closes(self):
+        # The sync test client goes through the WSGI handler, like runserver
+        response = self.client.get(self.url, {"session_id": "cs_test_sse"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertFalse(response.streaming)
+        self.assertIn(f'data: {{"id": {self.order.pk}, "status": "pending"}}'.encode(), response.content)
+        self.assertEqual(order_events.subscriber_count(self.order.pk), 0)
+
+    async def test_requires_session_or_owner(self):
+        response = await self.async_client.get(self.url, {"session_id": "cs_test_other"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(order_events.subscriber_count(self.order.pk), 0)
+
+
+class PostgresBrokerTests(TransactionTestCase):
+    async def test_dispatch_reaches_local_subscribers(self):
+        broker = PostgresBroker()
+        with mock.patch.object(broker, "_ensure_listener"):
+            async with broker.subscribe(1) as first, broker.subscribe(1) as second, broker.subscribe(2) as other:
+                broker.dispatch(json.dumps({"order_id": 1, "payload": {"id": 1, "status": "paid"}}))
+                self.assertEqual(await first.get(), {"id": 1, "status": "paid"})
+                self.assertEqual(await second.get(), {"id": 1, "status": "paid"})
+                self.assertTrue(other.empty())
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "LISTEN/NOTIFY needs PostgreSQL")
+    async def test_notify_round_trip(self):
+        broker = PostgresBroker()
+        async with broker.subscribe(1) as queue:
+            # Published from another connection, as the webhook worker would
+            await asyncio.to_thread(broker.publish, 1, {"id": 1, "status": "paid"})
+            self.assertEqual(await asyncio.wait_for(queue.get(), timeout=5), {"id": 1, "status": "paid"})
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        category = Category.objects.create(name="Coffrets", slug="coffrets")
+        product = Product.objects.create(category=category, name="Coffret dattes", slug="coffret", price=Decimal("12.00"))
+        self.order = Order.objects.create(user=self.user, status="paid", total_amount=Decimal("24.00"))
+        OrderItem.objects.create(order=self.order, product=product, quantity=2, price=product.price)
+        self.empty = Order.objects.create(user=self.user, status="pending", total_amount=Decimal("0"))
+
+    def test_command_csv_gzip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "orders.csv.gz"
+            today = timezone.localdate().isoformat()
+            call_command("export_orders", "--from", today, "--to", today, "--output", str(path), stdout=io.StringIO())
+            rows = list(csv.DictReader(io.StringIO(gzip.decompress(path.read_bytes()).decode("utf-8"))))
+        self.assertEqual([row["order_id"] for row in rows], [str(self.order.pk), str(self.empty.pk)])
+        self.assertEqual(rows[0]["product_name"], "Coffret dattes")
+        self.assertEqual(rows[0]["unit_price"], "12.00")
+        self.assertEqual(rows[1]["item_id"], "")
+
+    def test_command_date_range_and_status(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "orders.jsonl"
+            call_command("export_orders", "--format", "jsonl", "--status", "paid", "--output", str(path), stdout=io.StringIO())
+            records = [json.loads(line) for line in path.read_text().splitlines()]
+            call_command("export_orders", "--to", "2000-01-01", "--output", str(path), stdout=io.StringIO())
+            self.assertEqual(path.read_text().count("\n"), 1)  # header only
+        self.assertEqual([record["order_id"] for record in records], [self.order.pk])
+        self.assertEqual(records[0]["quantity"], 2)
+
+    def test_admin_action_streams(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "motdepasse")
+        self.client.force_login(admin)
+        response = self.client.post(
+            "/admin/orders/order/",
+            {"action": "export_csv", "_selected_action": [self.order.pk]},
+        )
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(len(body.strip().splitlines()), 2)
+        self.assertIn("Coffret dattes", body)
+
+
+class DailySalesTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        category = Category.objects.create(name="Coffrets", slug="coffrets")
+        self.dates = Product.objects.create(category=category, name="Dattes", slug="dattes", price=Decimal("10.00"), stock=50)
+        self.baklawa = Product.objects.create(category=category, name="Baklawa", slug="baklawa", price=Decimal("4.50"), stock=50)
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "motdepasse")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def pay(self, *lines):
+        from payments.fulfillment import fulfill_paid_order
+
+        order = Order.objects.create(user=self.user, total_amount=Decimal("0"))
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+        fulfill_paid_order(order, None)
+        return order
+
+    def rollup(self):
+        return sorted(DailyProductSales.objects.values_list("day", "product_id", "units", "revenue", "order_count"))
+
+    def test_fulfillment_increments_rollup(self):
+        self.pay((self.dates, 2), (self.baklawa, 1))
+        self.pay((self.dates, 1))
+        row = DailyProductSales.objects.get(product=self.dates)
+        self.assertEqual((row.units, row.revenue, row.order_count), (3, Decimal("30.00"), 2))
+
+    def test_rebuild_matches_incremental(self):
+        self.pay((self.dates, 2), (self.baklawa, 4))
+        self.pay((self.baklawa, 1))
+        incremental = self.rollup()
+        self.assertEqual(rebuild_daily_sales(), 2)
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_rebuild_in_chunks(self):
+        self.pay((self.dates, 2), (self.baklawa, 4))
+        self.pay((self.baklawa, 1))
+        incremental = self.rollup()
+        with mock.patch("orders.reports.ROLLUP_CHUNK_SIZE", 1):
+            self.assertEqual(rebuild_daily_sales(), 2)
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_top_products(self):
+        self.pay((self.dates, 2), (self.baklawa, 5))
+        response = self.client.get("/api/orders/reports/top-products/")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([row["slug"] for row in results], ["baklawa", "dattes"])
+        self.assertEqual(results[0]["revenue"], "22.50")
+        self.assertConstantQueries(
+            lambda: self.client.get("/api/orders/reports/top-products/"),
+            lambda: self.pay((self.dates, 1)),
+            max_queries=1,
+        )
+
+    def test_daily_revenue(self):
+        self.pay((self.dates, 2))
+        self.pay((self.baklawa, 2))
+        today = timezone.localdate().isoformat()
+        response = self.client.get("/api/orders/reports/daily-revenue/", {"from": today, "to": today})
+        self.assertEqual(response.json()["results"], [{"day": today, "revenue": "29.00", "units": 4}])
+
+    def test_reports_are_staff_only(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/orders/reports/daily-revenue/").status_code, 403)
@@ -4,5 +4,8 @@ from . import views
 urlpatterns = [
     path("", views.OrderListView.as_view(), name="order-list"),
     path("by-checkout-session/", views.order_by_checkout_session, name="order-by-checkout-session"),
+    path("reports/top-products/", views.TopProductsReportView.as_view(), name="report-top-products"),
+    path("reports/daily-revenue/", views.DailyRevenueReportView.as_view(), name="report-daily-revenue"),
     path("<int:pk>/", views.OrderDetailView.as_view(), name="order-detail"),
+    path("<int:pk>/events/", views.order_events_stream, name="order-events"),
 ]
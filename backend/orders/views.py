@@ -1,22 +1,85 @@
 from rest_framework.generics import ListAPIView, RetrieveAPIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from contextlib import AsyncExitStack
+from datetime import date, timedelta
+import asyncio
+import json
 import stripe
 
-from .models import Order
-from .serializers import OrderListSerializer, OrderSerializer
+from config.sparse import nested_selection, plan_columns, restrict_queryset, selects, sparse_spec
+from payments import stripe_client
+
+from .events import order_events
+from .models import Order, OrderItem
+from .pagination import OrderKeysetPagination
+from .reports import daily_revenue, top_products
+from .serializers import (
+    DailyRevenueSerializer,
+    OrderItemSerializer,
+    OrderListSerializer,
+    OrderSerializer,
+    OrderSummarySerializer,
+    TopProductSerializer,
+)
+
+
+def _order_queryset(serializer_class, request=None):
+    """
+    Orders for `serializer_class`; when it nests items, items, products and
+    categories are loaded in a fixed number of queries. With a sparse fieldset
+    (`?fields=`/`?expand=` on `request`) only the columns, joins and prefetches
+    it needs are fetched.
+    """
+    only, expand = sparse_spec(request)
+    # `user`, `status` and `stripe_session_id` are checked by the views,
+    # `created_at` is read by the pagination cursor.
+    orders = restrict_queryset(
+        Order.objects.all(), serializer_class, only, expand,
+        extra_columns=("user", "status", "stripe_session_id", "created_at"),
+    )
+    if "items" not in serializer_class.Meta.fields or not selects(only, "items"):
+        return orders
+    if only is None and expand is None:
+        return orders.with_items()
+    columns, joins = plan_columns(OrderItemSerializer, *nested_selection(only, expand, "items"))
+    items = OrderItem.objects.only("order", *columns)
+    if joins:
+        items = items.select_related(*joins)
+    return orders.with_items(items)
 
 
 class OrderListView(ListAPIView):
-    """List orders for the current authenticated user."""
+    """
+    List orders for the current authenticated user, newest first, optionally
+    filtered with `?status=paid`. Pass `?limit=` (then follow `next`) for
+    keyset pagination on (created_at, id). Rows carry the order summary only;
+    items are served by OrderDetailView.
+    """
     permission_classes = [IsAuthenticated]
-    serializer_class = OrderListSerializer
+    serializer_class = OrderSummarySerializer
+    pagination_class = OrderKeysetPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        queryset = _order_queryset(OrderSummarySerializer, self.request).filter(user=self.request.user)
+        order_status = self.request.query_params.get("status")
+        if order_status:
+            if order_status not in dict(Order.STATUS_CHOICES):
+                raise ValidationError({"status": f"Must be one of: {', '.join(dict(Order.STATUS_CHOICES))}."})
+            queryset = queryset.filter(status=order_status)
+        return queryset
 
 
 class OrderDetailView(RetrieveAPIView):
@@ -25,7 +88,11 @@ class OrderDetailView(RetrieveAPIView):
     serializer_class = OrderSerializer
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return _order_queryset(OrderSerializer, self.request).filter(user=self.request.user)
+
+
+def _verified_session_key(session_id):
+    return f"stripe-session-verified:{session_id}"
 
 
 @api_view(["GET"])
@@ -34,42 +101,167 @@ def order_by_checkout_session(request):
     """
     Return order details for a Stripe Checkout session_id (no auth).
     Used when the user lands on the success page in a different browser context (e.g. mobile)
-    where localStorage is empty. We verify the session with Stripe then return the order.
+    where localStorage is empty. The order is looked up by its stored session id; the session
+    is verified with Stripe the first time and while the order is pending, after which polls
+    are served from the DB and the verified-session cache.
     """
     session_id = request.query_params.get("session_id", "").strip()
     if not session_id:
         return Response({"error": "session_id required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    stripe_key = getattr(settings, "STRIPE_SECRET_KEY", "") or ""
-    if not stripe_key:
-        return Response(
-            {"error": "Stripe not configured"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
-    stripe.api_key = stripe_key
-
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-    except stripe.error.StripeError:
-        return Response({"error": "Invalid session"}, status=status.HTTP_400_BAD_REQUEST)
+        order = _order_queryset(OrderListSerializer, request).get(stripe_session_id=session_id)
+    except Order.DoesNotExist:
+        return Response({"error": "Order not found for this session"}, status=status.HTTP_404_NOT_FOUND)
+
+    verified_key = _verified_session_key(session_id)
+    if order.status == "pending" or cache.get(verified_key) != order.id:
+        stripe_key = getattr(settings, "STRIPE_SECRET_KEY", "") or ""
+        if not stripe_key:
+            return Response(
+                {"error": "Stripe not configured"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-    metadata = session.get("metadata") or {}
-    raw_order_id = metadata.get("order_id")
+        try:
+            session = stripe_client.retrieve_checkout(session_id)
+        except stripe.error.StripeError:
+            return Response({"error": "Invalid session"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only return the order if Stripe ties this session to it
+        metadata = session.get("metadata") or {}
+        if str(metadata.get("order_id")) != str(order.id):
+            return Response({"error": "Session does not match order"}, status=status.HTTP_404_NOT_FOUND)
+        cache.set(verified_key, order.id, settings.STRIPE_SESSION_CACHE_TTL)
+
+    serializer = OrderListSerializer(order, context={"request": request})
+    return Response(serializer.data)
+
+
+def _report_range(request, default_days):
+    """(from, to) days from `?from=&to=` (YYYY-MM-DD), defaulting to the last `default_days` days."""
+    params = request.query_params
     try:
-        order_id = int(raw_order_id) if raw_order_id is not None else None
-    except (TypeError, ValueError):
-        order_id = None
-    if not order_id:
-        return Response({"error": "Order not found for this session"}, status=status.HTTP_404_NOT_FOUND)
+        end = date.fromisoformat(params["to"]) if params.get("to") else timezone.localdate()
+        start = date.fromisoformat(params["from"]) if params.get("from") else end - timedelta(days=default_days - 1)
+    except ValueError:
+        raise ValidationError({"from": "Dates must be YYYY-MM-DD."})
+    if start > end:
+        raise ValidationError({"from": "Must not be after `to`."})
+    return start, end
+
+
+class TopProductsReportView(APIView):
+    """
+    Best sellers by units: `?from=&to=` (days, inclusive; default: the last 7 days),
+    at most `?limit=` (max 50) products. Staff only; read from the daily rollup.
+    """
+    permission_classes = [IsAdminUser]
+    default_days = 7
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        start, end = _report_range(request, self.default_days)
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        products = top_products(start, end, limit=max(1, min(limit, self.max_limit)))
+        return Response({"from": start, "to": end, "results": TopProductSerializer(products, many=True).data})
 
+
+class DailyRevenueReportView(APIView):
+    """
+    Revenue and units sold per day: `?from=&to=` (inclusive; default: the last 30 days),
+    e.g. `?from=2026-02-18&to=2026-03-19` for Ramadan. Staff only; read from the daily rollup.
+    """
+    permission_classes = [IsAdminUser]
+    default_days = 30
+
+    def get(self, request):
+        start, end = _report_range(request, self.default_days)
+        days = daily_revenue(start, end)
+        return Response({"from": start, "to": end, "results": DailyRevenueSerializer(days, many=True).data})
+
+
+def _bearer_user_id(request):
+    """User id from a valid JWT in the Authorization header (no DB access), else None."""
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
     try:
-        order = Order.objects.get(id=order_id)
-    except Order.DoesNotExist:
-        return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+        token = auth.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+    return str(token.get(jwt_settings.USER_ID_CLAIM))
 
-    # Only return order if this session is the one stored for this order (and optionally paid)
-    if order.stripe_session_id != session_id:
-        return Response({"error": "Session does not match order"}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = OrderListSerializer(order)
-    return Response(serializer.data)
+def _sse(payload, event="status"):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+async def _status_stream(order_id, order_status, updates, subscription):
+    loop = asyncio.get_running_loop()
+    async with subscription:
+        yield b"retry: 3000\n\n" + _sse({"id": order_id, "status": order_status})
+        if order_status != "pending":
+            return
+        deadline = loop.time() + settings.ORDER_EVENTS_MAX_DURATION
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                payload = await asyncio.wait_for(
+                    updates.get(), timeout=min(settings.ORDER_EVENTS_HEARTBEAT, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            yield _sse(payload)
+            if payload.get("status") != "pending":
+                return
+
+
+async def order_events_stream(request, pk):
+    """
+    Server-Sent Events stream of an order's status: one `status` event right
+    away, then one per change until the order leaves `pending`.
+    Allowed with `?session_id=` (the order's Checkout session, as on the
+    success page) or the owner's JWT. Waiting costs one DB read at connect
+    and no thread; updates come from `orders.events` (served by config/asgi.py).
+    Under WSGI only the current status is sent, then the response ends.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    # Subscribe before reading the status so a change in between is not lost.
+    subscription = AsyncExitStack()
+    updates = await subscription.enter_async_context(order_events.subscribe(pk))
+
+    order = await Order.objects.filter(pk=pk).values("status", "user_id", "stripe_session_id").afirst()
+    session_id = request.GET.get("session_id", "").strip()
+    allowed = order is not None and (
+        (session_id and session_id == order["stripe_session_id"])
+        or _bearer_user_id(request) == str(order["user_id"])
+    )
+    if not allowed:
+        await subscription.aclose()
+        return JsonResponse({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if not isinstance(request, ASGIRequest):
+        # WSGI (runserver) buffers a streaming body until it ends and holds a
+        # thread meanwhile: send the current status once and let EventSource
+        # reconnect.
+        await subscription.aclose()
+        return HttpResponse(
+            b"retry: 3000\n\n" + _sse({"id": pk, "status": order["status"]}),
+            content_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    return StreamingHttpResponse(
+        _status_stream(pk, order["status"], updates, subscription),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
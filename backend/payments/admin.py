@@ -1,3 +1,36 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import OutboundEmail, WebhookEvent
+from .outbox import requeue_emails
+from .webhooks import requeue_events
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "status", "attempts", "next_attempt_at", "created_at", "processed_at")
+    list_filter = ("status", "type")
+    search_fields = ("event_id",)
+    date_hierarchy = "created_at"
+    readonly_fields = ("event_id", "type", "payload", "attempts", "claimed_at", "last_error", "created_at", "processed_at")
+    actions = ["requeue"]
+
+    @admin.action(description="Relancer le traitement")
+    def requeue(self, request, queryset):
+        count = requeue_events(queryset)
+        self.message_user(request, f"{count} événement(s) remis en file.")
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("id", "subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("subject", "to")
+    date_hierarchy = "created_at"
+    raw_id_fields = ("order",)
+    readonly_fields = ("attempts", "claimed_at", "last_error", "created_at", "sent_at")
+    actions = ["requeue"]
+
+    @admin.action(description="Relancer l’envoi")
+    def requeue(self, request, queryset):
+        count = requeue_emails(queryset)
+        self.message_user(request, f"{count} email(s) remis en file.")
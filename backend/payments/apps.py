@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):
+        # One Stripe client (and connection pool) per process, ready before the first request
+        from .stripe_client import get_stripe_client
+
+        get_stripe_client()
+
+        # Fail at startup, not with success pages that never update
+        if settings.WEBHOOK_WORKER:
+            from .webhooks import ensure_shared_backends
+
+            ensure_shared_backends()
@@ -0,0 +1,70 @@
+"""
+Order fulfillment once Stripe reports a payment (webhook inbox worker or the
+confirm endpoint).
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.suggest import suggestion_index
+from orders.events import publish_order_status
+from orders.models import Order
+from orders.reports import record_daily_sales
+
+from .outbox import queue_email
+from .reservations import convert_reservations
+
+logger = logging.getLogger('payments.webhook')
+
+
+def fulfill_paid_order(order: Order, payment_intent_id: str | None):
+    """
+    Mark order as paid, make its stock reservations final, and queue the confirmation email.
+    Idempotent: the status flips with a conditional UPDATE, so when the webhook
+    and the confirm endpoint race only one of them fulfills the order.
+    """
+    paid_at = timezone.now()
+    with transaction.atomic():
+        # A cancelled order can still be paid: its hold expired before the payment landed
+        flipped = Order.objects.filter(pk=order.pk, status__in=("pending", "cancelled")).update(
+            status="paid", stripe_payment_intent_id=payment_intent_id, paid_at=paid_at, updated_at=paid_at
+        )
+        if not flipped:
+            # Already paid by a racing call, or refunded: report the actual status
+            order.refresh_from_db(fields=["status"])
+            logger.info("Order %s is %s; nothing to fulfill", order.id, order.status)
+            return
+        order.status = "paid"
+        order.stripe_payment_intent_id = payment_intent_id
+        order.paid_at = order.updated_at = paid_at
+        logger.info("Order %s marked as paid (payment_intent=%s)", order.id, payment_intent_id)
+
+        # Stock was reserved at checkout: make it final
+        items = list(order.items.all())
+        convert_reservations(order, items)
+        logger.info(
+            "Stock reservations converted for order %s: %s",
+            order.id,
+            {item.product_id: item.quantity for item in items},
+        )
+        # Sales reporting rollup
+        record_daily_sales(order, items)
+
+        # Confirmation email, delivered by the send_outbound_emails worker
+        queue_email(
+            subject=f"Commande #{order.id} confirmée",
+            body=(
+                f"Merci pour votre commande #{order.id}.\n\n"
+                f"Montant: {order.total_amount} €\n\n"
+                "Nous préparons votre livraison."
+            ),
+            to=[order.user.email],
+            order=order,
+        )
+
+        # Success pages waiting on /api/orders/<id>/events/
+        transaction.on_commit(lambda: publish_order_status(order))
+        # Popular products rank first in search-as-you-type suggestions
+        sales = {item.product_id: item.quantity for item in items}
+        transaction.on_commit(lambda: suggestion_index.record_sales(sales))
@@ -3,8 +3,11 @@ from django.contrib.auth.models import User
 from rest_framework.test import APIRequestFactory
 import json
 from catalog.models import Product
-from orders.models import Order, OrderItem
+from orders.models import DEFAULT_CURRENCY, OrderItem
 from payments import views
+from payments.outbox import send_outbound_emails
+from payments.webhooks import process_webhook_events
+from payments.reservations import create_reserved_order
 
 
 class Command(BaseCommand):
@@ -31,18 +34,9 @@ class Command(BaseCommand):
         quantity = 1
         total = product.price * quantity
 
-        order = Order.objects.create(
-            user=user,
-            total_amount=total,
-            status='pending'
-        )
-
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price=product.price,
-        )
+        # Same path as a real checkout: the order holds its stock until paid
+        item = OrderItem(product=product, quantity=quantity, price=product.price)
+        order, _ = create_reserved_order(user, [item], total, DEFAULT_CURRENCY)
 
         self.stdout.write(self.style.SUCCESS(f'Created test order {order.id} for user {user.email}'))
 
@@ -65,4 +59,7 @@ class Command(BaseCommand):
 
         response = views.stripe_webhook(request)
         status = getattr(response, 'status_code', None)
-        self.stdout.write(self.style.SUCCESS(f'Simulated webhook for order {order.id}, response status: {status}'))
+        # The webhook only stores the event: apply it and send the emails like the workers would
+        processed, failed = process_webhook_events()
+        send_outbound_emails(rate=0)
+        self.stdout.write(self.style.SUCCESS(f'Simulated webhook for order {order.id}, response status: {status} (events processed: {processed}, failed: {failed})'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.webhooks import DEFAULT_BATCH_SIZE, ensure_shared_backends, process_webhook_events
+
+
+class Command(BaseCommand):
+    help = "Apply the Stripe events stored by the webhook (retries failures with backoff, dead-letters the rest)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Events claimed at a time.")
+        parser.add_argument("--once", action="store_true", help="Drain the due events and exit (cron).")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between polls of an empty inbox.")
+
+    def handle(self, *args, **options):
+        # Even with WEBHOOK_WORKER off (e.g. draining retries from cron)
+        ensure_shared_backends()
+        while True:
+            processed, failed = process_webhook_events(options["batch_size"])
+            if processed or failed:
+                self.stdout.write(f"Processed {processed} Stripe events, {failed} failed.")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from payments.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Give back the stock held by expired reservations and cancel their pending orders (run from cron)."
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired stock reservations."))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.outbox import DEFAULT_BATCH_SIZE, send_outbound_emails
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails over one reused connection (retries failures with backoff, dead-letters the rest)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Messages claimed at a time.")
+        parser.add_argument("--rate", type=float, default=None, help="Messages per second (default EMAIL_OUTBOX_RATE, 0 = no limit).")
+        parser.add_argument("--once", action="store_true", help="Send the due messages and exit (cron).")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls of an empty outbox.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_outbound_emails(options["batch_size"], options["rate"])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 from rest_framework.test import APIRequestFactory
 import json
 from payments import views
+from payments.outbox import send_outbound_emails
+from payments.webhooks import process_webhook_events
 
 
 class Command(BaseCommand):
@@ -32,4 +34,7 @@ class Command(BaseCommand):
 
         response = views.stripe_webhook(request)
         status = getattr(response, 'status_code', None)
-        self.stdout.write(self.style.SUCCESS(f'Simulated webhook for order {order_id}, response status: {status}'))
+        # The webhook only stores the event: apply it and send the emails like the workers would
+        processed, failed = process_webhook_events()
+        send_outbound_emails(rate=0)
+        self.stdout.write(self.style.SUCCESS(f'Simulated webhook for order {order_id}, response status: {status} (events processed: {processed}, failed: {failed})'))
@@ -0,0 +1,99 @@
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from catalog.models import Category, Product
+from orders.models import DEFAULT_CURRENCY, Order, OrderItem
+from payments.models import StockReservation
+from payments.reservations import InsufficientStock, create_reserved_order, release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Run many simultaneous checkouts for one product with little stock and check "
+        "that exactly the available units are reserved, never more (test data is deleted afterwards)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checkouts", type=int, default=300, help="Simultaneous checkouts.")
+        parser.add_argument("--stock", type=int, default=25, help="Units available for the product.")
+        parser.add_argument("--quantity", type=int, default=1, help="Units per checkout.")
+
+    def handle(self, *args, **options):
+        checkouts, stock, quantity = options["checkouts"], options["stock"], options["quantity"]
+        category = Category.objects.create(name="Stress — réservations", slug="stress-reservations")
+        product = Product.objects.create(
+            category=category, name="Stress — produit", slug="stress-reservations", price=Decimal("5.00"), stock=stock
+        )
+        user, _ = User.objects.get_or_create(username="stress-reservations@example.com")
+        try:
+            self._run(product, user, checkouts, stock, quantity)
+        finally:
+            Order.objects.filter(user=user).delete()
+            product.delete()
+            category.delete()
+            user.delete()
+
+    def _run(self, product, user, checkouts, stock, quantity):
+        start = threading.Barrier(checkouts)
+        outcomes = {"reserved": 0, "rejected": 0, "retries": 0}
+        lock = threading.Lock()
+
+        def checkout(_):
+            start.wait()
+            try:
+                for attempt in range(50):
+                    item = OrderItem(product=product, quantity=quantity, price=product.price)
+                    try:
+                        create_reserved_order(user, [item], product.price * quantity, DEFAULT_CURRENCY)
+                        outcome = "reserved"
+                    except InsufficientStock:
+                        outcome = "rejected"
+                    except OperationalError:
+                        # SQLite serialises writers ("database is locked"); servers don't need this
+                        with lock:
+                            outcomes["retries"] += 1
+                        time.sleep(0.01 * (attempt + 1))
+                        continue
+                    with lock:
+                        outcomes[outcome] += 1
+                    return
+                raise CommandError("Checkout still failing after 50 attempts")
+            finally:
+                connection.close()
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=checkouts) as pool:
+            list(pool.map(checkout, range(checkouts)))
+        elapsed = time.perf_counter() - began
+
+        product.refresh_from_db()
+        held = (
+            StockReservation.objects.filter(product=product, status=StockReservation.ACTIVE).aggregate(
+                total=Sum("quantity")
+            )["total"]
+            or 0
+        )
+        expected = min(checkouts, stock // quantity)
+        self.stdout.write(
+            f"{checkouts} checkouts of {quantity} for {stock} units in {elapsed:.2f}s: "
+            f"{outcomes['reserved']} reserved, {outcomes['rejected']} rejected "
+            f"({outcomes['retries']} lock retries), stock left {product.stock}, units held {held}"
+        )
+        if outcomes["reserved"] != expected or held != expected * quantity or product.stock + held != stock:
+            raise CommandError("Stock and reservations do not add up")
+
+        # Expiry gives everything back
+        release_expired_reservations(product_ids=[product.pk], now=timezone.now() + timedelta(days=1))
+        product.refresh_from_db()
+        if product.stock != stock:
+            raise CommandError(f"Stock after release is {product.stock}, expected {stock}")
+        self.stdout.write(self.style.SUCCESS("Reservations add up; releasing them restored the stock."))
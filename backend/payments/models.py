@@ -1,3 +1,117 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+from catalog.models import Product
+from orders.models import Order
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for a pending order. The product stock is decremented when the
+    reservation is taken (checkout); it becomes final when the order is paid
+    (`converted`) and goes back to the product on expiry or cancellation
+    (`released`). See payments/reservations.py.
+    """
+    ACTIVE = 'active'
+    CONVERTED = 'converted'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (ACTIVE, 'Active'),
+        (CONVERTED, 'Vendue'),
+        (RELEASED, 'Libérée'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ACTIVE)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Expiry sweep
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_exp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} for order {self.order_id} ({self.status})"
+
+
+class WebhookEvent(models.Model):
+    """
+    Inbox of verified Stripe events. The webhook only stores them (the unique
+    Stripe event id drops redeliveries) and answers at once; the
+    `process_webhook_events` worker applies them. See payments/webhooks.py.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    PROCESSED = 'processed'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, 'En attente'),
+        (PROCESSING, 'En cours'),
+        (PROCESSED, 'Traité'),
+        (DEAD, 'Abandonné'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Worker: due events, oldest first
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.type}, {self.status})"
+
+
+class OutboundEmail(models.Model):
+    """
+    Email outbox. Messages are written in the transaction of the change they
+    announce (a paid order), so none is lost or sent for a rolled-back change;
+    the `send_outbound_emails` worker delivers them. See payments/outbox.py.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, 'En attente'),
+        (SENDING, 'En cours'),
+        (SENT, 'Envoyé'),
+        (DEAD, 'Abandonné'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Sender: due messages, oldest first
+            models.Index(fields=['status', 'next_attempt_at'], name='email_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,132 @@
+"""
+Transactional email outbox.
+
+`queue_email` writes the message in the caller's transaction: an order marked
+paid always gets its confirmation, a rolled-back one never does, and the
+request or webhook worker does not wait for the mail server. The
+`send_outbound_emails` worker claims due messages in batches and delivers them
+over one reused connection, at most EMAIL_OUTBOX_RATE per second. A failed
+message is retried with exponential backoff and dead-lettered after
+EMAIL_OUTBOX_MAX_ATTEMPTS.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger('payments.email')
+
+DEFAULT_BATCH_SIZE = 100
+# A message claimed for longer than this (sender killed mid-batch) is claimed again
+SENDING_LEASE = timedelta(minutes=10)
+
+
+def queue_email(subject, body, to, order=None, from_email=None) -> OutboundEmail:
+    """Add a message to the outbox; call it inside the transaction of the change it announces."""
+    return OutboundEmail.objects.create(
+        order=order,
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt, after `attempts` failed ones."""
+    seconds = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.EMAIL_OUTBOX_RETRY_MAX_DELAY))
+
+
+def claim_emails(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Claim up to `batch_size` due messages for this sender. Each one leaves
+    `pending` through a conditional update, so concurrent senders never
+    deliver the same message.
+    """
+    now = now or timezone.now()
+    OutboundEmail.objects.filter(status=OutboundEmail.SENDING, claimed_at__lt=now - SENDING_LEASE).update(
+        status=OutboundEmail.PENDING
+    )
+    due = list(
+        OutboundEmail.objects.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    claimed = [
+        pk
+        for pk in due
+        if OutboundEmail.objects.filter(pk=pk, status=OutboundEmail.PENDING).update(
+            status=OutboundEmail.SENDING, claimed_at=now, attempts=F('attempts') + 1
+        )
+    ]
+    return list(OutboundEmail.objects.filter(pk__in=claimed).order_by('created_at', 'pk'))
+
+
+def _failed(email: OutboundEmail, exc: Exception) -> None:
+    now = timezone.now()
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        status, next_attempt_at = OutboundEmail.DEAD, now
+        logger.error('Email %s to %s dead-lettered after %s attempts: %s', email.pk, email.to, email.attempts, exc)
+    else:
+        status, next_attempt_at = OutboundEmail.PENDING, now + retry_delay(email.attempts)
+        logger.warning('Email %s to %s failed (attempt %s), retrying at %s: %s',
+                       email.pk, email.to, email.attempts, next_attempt_at, exc)
+    OutboundEmail.objects.filter(pk=email.pk).update(
+        status=status, next_attempt_at=next_attempt_at, claimed_at=None, last_error=f'{type(exc).__name__}: {exc}'
+    )
+
+
+def send_outbound_emails(batch_size=DEFAULT_BATCH_SIZE, rate=None):
+    """
+    Deliver every due message, batch after batch, over a single connection to
+    the mail server; `rate` caps messages per second (EMAIL_OUTBOX_RATE by
+    default, 0 for no limit). Returns (sent, failed).
+    """
+    rate = settings.EMAIL_OUTBOX_RATE if rate is None else rate
+    interval = 1 / rate if rate > 0 else 0
+    sent = failed = 0
+    last_sent = float('-inf')
+    connection = get_connection()
+    try:
+        while emails := claim_emails(batch_size):
+            for email in emails:
+                wait = last_sent + interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                last_sent = time.monotonic()
+                message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+                try:
+                    # No-op once connected; send_messages() would otherwise
+                    # open and close a connection for every message
+                    connection.open()
+                    connection.send_messages([message])
+                except Exception as exc:
+                    _failed(email, exc)
+                    failed += 1
+                    # Start the next message on a fresh connection
+                    connection.close()
+                    continue
+                # Marked one by one: a sender killed mid-batch does not resend what went out
+                OutboundEmail.objects.filter(pk=email.pk).update(
+                    status=OutboundEmail.SENT, sent_at=timezone.now(), claimed_at=None, last_error=''
+                )
+                sent += 1
+    finally:
+        connection.close()
+    if sent or failed:
+        logger.info('Outbox: %s emails sent, %s failed', sent, failed)
+    return sent, failed
+
+
+def requeue_emails(emails) -> int:
+    """Give dead-lettered (or failing) `emails` a fresh set of attempts, due now."""
+    return emails.filter(status__in=(OutboundEmail.PENDING, OutboundEmail.DEAD)).update(
+        status=OutboundEmail.PENDING, attempts=0, next_attempt_at=timezone.now(), claimed_at=None
+    )
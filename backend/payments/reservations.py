@@ -0,0 +1,174 @@
+"""
+Stock reservations for pending orders.
+
+Checkout takes the stock right away with a conditional decrement
+(`UPDATE ... SET stock = stock - n WHERE stock >= n`), which the database
+applies atomically per row: concurrent checkouts for the last units cannot
+both succeed and no update is lost. The hold is recorded as a StockReservation
+that is either converted when the order is paid or released (stock given
+back) when it expires or the checkout is cancelled. Each reservation leaves
+`active` through a conditional update as well, so a late payment and an
+expiry sweep can never both act on it.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from catalog.cache import invalidate_stock
+from catalog.models import Product
+from orders.models import Order, OrderItem
+
+from .models import StockReservation
+
+logger = logging.getLogger('payments.reservations')
+
+RELEASE_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product):
+        super().__init__(f"Insufficient stock for {product.name}")
+        self.product = product
+
+
+def _quantities(items) -> Counter:
+    quantities = Counter()
+    for item in items:
+        quantities[item.product_id] += item.quantity
+    return quantities
+
+
+def reserve_stock(order, items, ttl=None):
+    """
+    Take the stock for `items` of a pending `order` and record the reservations.
+    Must run inside the caller's transaction: on InsufficientStock the
+    decrements already made are rolled back with it. Returns the expiry.
+    """
+    ttl = settings.STOCK_RESERVATION_TTL if ttl is None else ttl
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    products = {item.product_id: item.product for item in items}
+    quantities = _quantities(items)
+
+    # One statement for the whole cart: each row is only decremented if it
+    # still holds enough stock, so fewer updated rows means a line is short.
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+    decrement = Case(
+        *(When(pk=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()),
+        default=F('stock'),
+        output_field=Product._meta.get_field('stock'),
+    )
+    if Product.objects.filter(enough).update(stock=decrement) != len(quantities):
+        short = Product.objects.filter(pk__in=quantities).values_list('pk', 'stock')
+        # The first short line; any line if stock came back in the meantime
+        product_id = next((pk for pk, stock in short if stock < quantities[pk]), min(quantities))
+        raise InsufficientStock(products[product_id])
+
+    StockReservation.objects.bulk_create(
+        StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in quantities.items()
+    )
+    transaction.on_commit(lambda: invalidate_stock(quantities))
+    return expires_at
+
+
+def create_reserved_order(user, items, total_amount, currency):
+    """
+    Create a pending order with its `items` (unsaved OrderItems) and reserve
+    their stock, all in one transaction. Returns (order, reservation expiry);
+    raises InsufficientStock.
+    """
+    order = Order(user=user, total_amount=total_amount, status='pending', currency=currency)
+    order.set_summary(items)
+    with transaction.atomic():
+        order.save()
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        expires_at = reserve_stock(order, items)
+    return order, expires_at
+
+
+def convert_reservations(order, items):
+    """
+    Make the stock held for a paid `order` final. Quantities that are not
+    covered by an active reservation (released after expiry, or orders created
+    before reservations existed) are taken from the stock now, never below 0.
+    """
+    now = timezone.now()
+    StockReservation.objects.filter(order=order, status=StockReservation.ACTIVE).update(
+        status=StockReservation.CONVERTED, closed_at=now
+    )
+    missing = _quantities(items)
+    converted = StockReservation.objects.filter(order=order, status=StockReservation.CONVERTED)
+    for product_id, quantity in converted.values_list('product_id', 'quantity'):
+        missing[product_id] -= quantity
+
+    missing = {product_id: quantity for product_id, quantity in missing.items() if quantity > 0}
+    if not missing:
+        return
+    # One statement for every line, never below 0
+    Product.objects.filter(pk__in=missing).update(
+        stock=Case(
+            *(When(pk=product_id, then=Greatest(F('stock') - quantity, 0)) for product_id, quantity in missing.items()),
+            default=F('stock'),
+            output_field=Product._meta.get_field('stock'),
+        )
+    )
+    logger.warning("Order %s paid without an active reservation: took %s from stock", order.id, missing)
+    transaction.on_commit(lambda: invalidate_stock(missing))
+
+
+def release_reservations(reservations, cancel_orders=False):
+    """
+    Give the stock of the still-active `reservations` (a queryset) back to the
+    products; with `cancel_orders`, their orders still pending are cancelled.
+    Returns the number of reservations released.
+    """
+    released = 0
+    while True:
+        batch = list(
+            reservations.filter(status=StockReservation.ACTIVE)
+            .order_by('pk')
+            .values_list('pk', 'order_id', 'product_id', 'quantity')[:RELEASE_BATCH_SIZE]
+        )
+        if not batch:
+            return released
+        returned = Counter()
+        order_ids = set()
+        with transaction.atomic():
+            now = timezone.now()
+            for pk, order_id, product_id, quantity in batch:
+                # Lost races (converted or released meanwhile) update nothing.
+                if StockReservation.objects.filter(pk=pk, status=StockReservation.ACTIVE).update(
+                    status=StockReservation.RELEASED, closed_at=now
+                ):
+                    Product.objects.filter(pk=product_id).update(stock=F('stock') + quantity)
+                    returned[product_id] += quantity
+                    order_ids.add(order_id)
+                    released += 1
+            if cancel_orders and order_ids:
+                Order.objects.filter(pk__in=order_ids, status='pending').update(status='cancelled', updated_at=now)
+            transaction.on_commit(lambda returned=returned: invalidate_stock(returned))
+        if returned:
+            logger.info("Released reservations of orders %s (stock returned: %s)", sorted(order_ids), dict(returned))
+
+
+def release_expired_reservations(product_ids=None, now=None):
+    """Release reservations past their expiry (optionally only for `product_ids`) and cancel their orders."""
+    expired = StockReservation.objects.filter(status=StockReservation.ACTIVE, expires_at__lte=now or timezone.now())
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=product_ids)
+    return release_reservations(expired, cancel_orders=True)
+
+
+def release_order_reservations(order):
+    """Checkout abandoned or failed: give the order's stock back and cancel it."""
+    return release_reservations(StockReservation.objects.filter(order=order), cancel_orders=True)
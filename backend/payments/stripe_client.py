@@ -0,0 +1,132 @@
+"""
+Shared Stripe client.
+
+One `stripe.StripeClient` per process, built when the app starts: its HTTP
+session keeps a pool of keep-alive connections to the Stripe API (sized with
+STRIPE_HTTP_POOL_SIZE, about the number of request threads), so checkouts stop
+paying a TLS handshake each. Calls have connect/read timeouts, only idempotent
+calls are retried (reads, and writes sent with an idempotency key), and every
+HTTP attempt is recorded in the `stripe_latency` histogram.
+"""
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+import stripe
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from requests.adapters import HTTPAdapter
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class LatencyHistogram:
+    """Thread-safe per-endpoint latency histogram (cumulative buckets, like Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.setdefault(name, {"counts": [0] * len(self.buckets), "count": 0, "sum": 0.0})
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["counts"][i] += 1
+            series["count"] += 1
+            series["sum"] += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": series["count"],
+                    "sum": round(series["sum"], 6),
+                    "buckets": {str(bound): count for bound, count in zip(self.buckets, series["counts"])},
+                }
+                for name, series in sorted(self._series.items())
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+stripe_latency = LatencyHistogram()
+
+# Object ids in API paths (cs_test_..., pi_...) would make one series per call
+_OBJECT_ID = re.compile(r"/[a-z]+_[A-Za-z0-9_]+")
+
+
+class TimedRequestsClient(stripe.RequestsClient):
+    """RequestsClient recording each HTTP attempt (retries included) in `stripe_latency`."""
+
+    def request(self, method, url, headers, post_data=None):
+        start = time.perf_counter()
+        try:
+            return super().request(method, url, headers, post_data)
+        finally:
+            endpoint = _OBJECT_ID.sub("/{id}", urlsplit(url).path)
+            stripe_latency.observe(f"{method.upper()} {endpoint}", time.perf_counter() - start)
+
+
+def build_stripe_client() -> stripe.StripeClient:
+    session = requests.Session()
+    session.mount(
+        "https://",
+        HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE),
+    )
+    http_client = TimedRequestsClient(
+        session=session,
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+    )
+    # No retries by default: each call opts in when it is idempotent
+    return stripe.StripeClient(settings.STRIPE_SECRET_KEY, http_client=http_client, max_network_retries=0)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_stripe_client() -> stripe.StripeClient:
+    """The process-wide client (built in PaymentsConfig.ready())."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_stripe_client()
+    return _client
+
+
+@receiver(setting_changed)
+def _reset_client(setting, **kwargs):
+    # Tests overriding STRIPE_* settings get a client built from them
+    global _client
+    if setting.startswith("STRIPE_"):
+        _client = None
+
+
+def _retried():
+    return {"max_network_retries": settings.STRIPE_MAX_NETWORK_RETRIES}
+
+
+def retrieve_checkout(session_id: str):
+    """Fetch a Checkout Session; a read, so network errors are retried."""
+    return get_stripe_client().checkout.sessions.retrieve(session_id, options=_retried())
+
+
+def create_checkout(params: dict, idempotency_key: str):
+    """Create a Checkout Session; the idempotency key makes retries safe (Stripe replays the first result)."""
+    return get_stripe_client().checkout.sessions.create(
+        params=params, options={**_retried(), "idempotency_key": idempotency_key}
+    )
+
+
+def construct_event(payload: bytes, sig_header: str, secret: str):
+    """Verify a signed webhook payload (no API call)."""
+    return get_stripe_client().construct_event(payload, sig_header, secret)
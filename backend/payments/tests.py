@@ -1,3 +1,421 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from catalog.models import Category, Product
+from config.testing import QueryBudgetMixin
+from orders.models import DailyProductSales, Order, OrderItem
+from payments.reservations import create_reserved_order, release_expired_reservations, release_order_reservations
+from payments.fulfillment import fulfill_paid_order
+from payments.models import OutboundEmail, StockReservation, WebhookEvent
+from payments.outbox import send_outbound_emails
+from payments.stripe_client import LatencyHistogram, get_stripe_client
+from payments.webhooks import (
+    PROCESSING_LEASE,
+    claim_events,
+    ensure_shared_backends,
+    process_webhook_events,
+    retry_delay,
+    store_event,
+)
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test_dummy")
+class CheckoutSessionTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="Coffrets", slug="coffrets")
+        self.cart = []
+        self.add_lines(2)
+        self.session = mock.Mock(id="cs_test_cart", url="https://checkout.stripe.test/cs_test_cart")
+
+    def add_lines(self, count=9):
+        for _ in range(count):
+            index = len(self.cart)
+            product = Product.objects.create(
+                category=self.category, name=f"Coffret n°{index}", slug=f"coffret-{index}", price=Decimal("6.00"), stock=50
+            )
+            self.cart.append({"id": product.pk, "name": product.name, "price": 6, "quantity": 2})
+
+    def checkout(self):
+        Order.objects.filter(stripe_session_id=self.session.id).update(stripe_session_id=None)
+        with mock.patch("payments.stripe_client.create_checkout", return_value=self.session):
+            response = self.client.post("/api/payments/create-checkout-session/", {"items": self.cart}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_checkout_queries_do_not_grow_with_cart(self):
+        self.assertConstantQueries(self.checkout, self.add_lines)
+
+    def test_checkout_creates_order_and_items(self):
+        self.add_lines(18)
+        self.checkout()
+        order = Order.objects.get(stripe_session_id="cs_test_cart")
+        self.assertEqual(order.items.count(), 20)
+        self.assertEqual(order.item_count, 40)
+        self.assertEqual(order.total_amount, Decimal("240.00"))
+
+    def test_unknown_product(self):
+        self.cart.append({"id": 999999, "name": "?", "price": 1, "quantity": 1})
+        response = self.client.post("/api/payments/create-checkout-session/", {"items": self.cart}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+# Unsigned webhooks are only accepted in DEBUG
+@override_settings(STRIPE_SECRET_KEY="sk_test_dummy", STRIPE_WEBHOOK_SECRET="", DEBUG=True)
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Coffrets", slug="coffrets")
+        self.product = Product.objects.create(
+            category=category, name="Coffret dattes", slug="coffret-dattes", price=Decimal("6.00"), stock=3
+        )
+
+    def checkout(self, quantity=2):
+        session = mock.Mock(id=f"cs_test_{Order.objects.count()}", url="https://checkout.stripe.test/")
+        items = [{"id": self.product.pk, "name": self.product.name, "price": 6, "quantity": quantity}]
+        with mock.patch("payments.stripe_client.create_checkout", return_value=session):
+            return self.client.post("/api/payments/create-checkout-session/", {"items": items}, format="json")
+
+    def webhook(self, event_type, order):
+        event = {
+            "id": f"evt_{event_type}_{order.pk}",
+            "type": event_type,
+            "data": {"object": {"id": order.stripe_session_id, "metadata": {"order_id": str(order.pk)}}},
+        }
+        response = self.client.post("/api/payments/webhook/", event, format="json")
+        process_webhook_events()
+        return response
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def test_checkout_reserves_stock(self):
+        self.assertEqual(self.checkout().status_code, 200)
+        self.assertEqual(self.stock(), 1)
+        reservation = StockReservation.objects.get()
+        self.assertEqual((reservation.quantity, reservation.status), (2, StockReservation.ACTIVE))
+
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_payment_converts_reservation_without_taking_stock_again(self):
+        self.checkout()
+        order = Order.objects.get()
+        self.assertEqual(self.webhook("checkout.session.completed", order).status_code, 200)
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.CONVERTED)
+
+    def test_expired_reservations_are_released(self):
+        self.checkout()
+        order = Order.objects.get()
+        self.assertEqual(release_expired_reservations(), 0)
+
+        released = release_expired_reservations(now=timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL))
+        self.assertEqual(released, 1)
+        self.assertEqual(self.stock(), 3)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "cancelled")
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.RELEASED)
+
+    def test_expired_checkout_session_releases_stock(self):
+        self.checkout()
+        self.webhook("checkout.session.expired", Order.objects.get())
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(Order.objects.get().status, "cancelled")
+
+    def test_late_payment_takes_stock_again(self):
+        self.checkout()
+        order = Order.objects.get()
+        release_order_reservations(order)
+        Product.objects.filter(pk=self.product.pk).update(stock=1)
+
+        self.webhook("checkout.session.completed", order)
+        self.assertEqual(self.stock(), 0)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "paid")
+
+
+class FulfillmentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.category = Category.objects.create(name="Coffrets", slug="coffrets")
+
+    def order(self, lines, reserve=True):
+        products = [
+            Product.objects.create(
+                category=self.category, name=f"Coffret {Product.objects.count()}",
+                slug=f"coffret-{Product.objects.count()}", price=Decimal("6.00"), stock=10,
+            )
+            for _ in range(lines)
+        ]
+        items = [OrderItem(product=product, quantity=2, price=product.price) for product in products]
+        if reserve:
+            order, _ = create_reserved_order(self.user, items, Decimal("12.00") * lines, "eur")
+        else:
+            order = Order.objects.create(user=self.user, total_amount=Decimal("12.00") * lines)
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+        return order, products
+
+    def fulfill_queries(self, order):
+        with CaptureQueriesContext(connection) as context:
+            fulfill_paid_order(order, f"pi_test_{order.pk}")
+        return len(context)
+
+    def test_queries_do_not_grow_with_order_size(self):
+        for reserve in (True, False):
+            with self.subTest(reserve=reserve):
+                small = self.fulfill_queries(self.order(2, reserve)[0])
+                large = self.fulfill_queries(self.order(20, reserve)[0])
+                self.assertEqual(large, small)
+
+    def test_stock_is_taken_once(self):
+        order, products = self.order(3, reserve=False)
+        fulfill_paid_order(order, "pi_test")
+        # A racing webhook or confirm call holding a stale pending copy
+        stale = Order.objects.get(pk=order.pk)
+        stale.status = "pending"
+        fulfill_paid_order(stale, "pi_test")
+
+        self.assertEqual([p.stock for p in Product.objects.filter(pk__in=[p.pk for p in products])], [8, 8, 8])
+        self.assertEqual(stale.status, "paid")
+        self.assertEqual(sum(DailyProductSales.objects.values_list("order_count", flat=True)), 3)
+
+    def test_refunded_order_is_not_reported_paid(self):
+        order, products = self.order(1, reserve=False)
+        Order.objects.filter(pk=order.pk).update(status="refunded")
+        fulfill_paid_order(order, "pi_test")
+        self.assertEqual(order.status, "refunded")
+        self.assertEqual(Product.objects.get(pk=products[0].pk).stock, 10)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test_dummy", STRIPE_WEBHOOK_SECRET="", DEBUG=True, WEBHOOK_WORKER=True)
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+        self.order = Order.objects.create(user=self.user, total_amount=Decimal("6.00"))
+        self.client = APIClient()
+
+    def post(self, event_id="evt_paid"):
+        event = {
+            "id": event_id,
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": "cs_test", "metadata": {"order_id": str(self.order.pk)}, "payment_intent": "pi_test"}},
+        }
+        return self.client.post("/api/payments/webhook/", event, format="json")
+
+    def test_webhook_stores_event_without_processing_it(self):
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.post().status_code, 200)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.event_id, event.status), ("evt_paid", WebhookEvent.PENDING))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "pending")
+
+        self.assertEqual(process_webhook_events(), (1, 0))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "paid")
+        self.assertEqual(WebhookEvent.objects.get().status, WebhookEvent.PROCESSED)
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_dead_lettered(self):
+        self.post()
+        with mock.patch("payments.webhooks.fulfill_paid_order", side_effect=RuntimeError("db down")):
+            self.assertEqual(process_webhook_events(), (0, 1))
+            event = WebhookEvent.objects.get()
+            self.assertEqual((event.status, event.attempts), (WebhookEvent.PENDING, 1))
+            self.assertGreater(event.next_attempt_at, timezone.now() + retry_delay(1) - timedelta(seconds=5))
+            # Not due yet
+            self.assertEqual(process_webhook_events(), (0, 0))
+
+            WebhookEvent.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(process_webhook_events(), (0, 1))
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.DEAD, 2))
+        self.assertEqual(event.last_error, "RuntimeError: db down")
+
+    @override_settings(WEBHOOK_WORKER=False)
+    def test_webhook_applies_event_without_worker(self):
+        self.assertEqual(self.post().status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "paid")
+        self.assertEqual(WebhookEvent.objects.get().status, WebhookEvent.PROCESSED)
+        self.assertEqual(process_webhook_events(), (0, 0))
+
+    @override_settings(WEBHOOK_WORKER=False)
+    def test_failure_without_worker_is_redelivered(self):
+        with mock.patch("payments.webhooks.fulfill_paid_order", side_effect=RuntimeError("db down")):
+            self.assertEqual(self.post().status_code, 500)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.PENDING, 1))
+
+        # Stripe redelivers the same event: it is applied this time
+        self.assertEqual(self.post().status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "paid")
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.PROCESSED, 2))
+        self.assertEqual(self.post().status_code, 200)
+
+    def test_worker_requires_shared_backends(self):
+        with override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            ORDER_EVENTS_BROKER="orders.events.InProcessBroker",
+        ):
+            with self.assertRaisesMessage(ImproperlyConfigured, "LocMemCache"):
+                ensure_shared_backends()
+            with self.assertRaisesMessage(ImproperlyConfigured, "InProcessBroker"):
+                ensure_shared_backends()
+            with self.assertRaises(ImproperlyConfigured):
+                call_command("process_webhook_events", once=True, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}},
+            ORDER_EVENTS_BROKER="orders.events.PostgresBroker",
+        ):
+            if connection.vendor == "postgresql":
+                ensure_shared_backends()
+            else:
+                with self.assertRaisesMessage(ImproperlyConfigured, "needs postgresql"):
+                    ensure_shared_backends()
+
+    @override_settings(WEBHOOK_RETRY_DELAY=30, WEBHOOK_RETRY_MAX_DELAY=3600)
+    def test_backoff_doubles_up_to_max(self):
+        self.assertEqual([retry_delay(n).total_seconds() for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(retry_delay(20).total_seconds(), 3600)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("client@example.com", "client@example.com", "motdepasse")
+
+    def pay(self):
+        order = Order.objects.create(user=self.user, total_amount=Decimal("6.00"))
+        fulfill_paid_order(order, f"pi_test_{order.pk}")
+        return order
+
+    def test_fulfillment_queues_confirmation(self):
+        order = self.pay()
+        self.assertEqual(mail.outbox, [])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.order, email.to, email.status), (order, ["client@example.com"], OutboundEmail.PENDING))
+
+        self.assertEqual(send_outbound_emails(rate=0), (1, 0))
+        self.assertEqual(mail.outbox[0].subject, f"Commande #{order.pk} confirmée")
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.SENT)
+        self.assertEqual(send_outbound_emails(rate=0), (0, 0))
+
+    def test_batch_reuses_one_connection(self):
+        for _ in range(3):
+            self.pay()
+        with mock.patch("payments.outbox.get_connection", wraps=get_connection) as connect:
+            self.assertEqual(send_outbound_emails(rate=0), (3, 0))
+        connect.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_dead_lettered(self):
+        self.pay()
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=SMTPException("refused")
+        ):
+            self.assertEqual(send_outbound_emails(rate=0), (0, 1))
+            email = OutboundEmail.objects.get()
+            self.assertEqual((email.status, email.attempts), (OutboundEmail.PENDING, 1))
+            self.assertEqual(send_outbound_emails(rate=0), (0, 0))
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_outbound_emails(rate=0), (0, 1))
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.last_error), (OutboundEmail.DEAD, "SMTPException: refused"))
+        self.assertEqual(mail.outbox, [])
+
+    def test_rate_limit(self):
+        for _ in range(3):
+            self.pay()
+        with mock.patch("payments.outbox.time.sleep") as sleep:
+            send_outbound_emails(rate=2)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertTrue(all(0 < call.args[0] <= 0.5 for call in sleep.call_args_list))
+
+
+class StripeClientTests(TestCase):
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram(buckets=(0.1, 1))
+        for seconds in (0.05, 0.5, 3):
+            histogram.observe("GET /v1/checkout/sessions/{id}", seconds)
+        series = histogram.snapshot()["GET /v1/checkout/sessions/{id}"]
+        self.assertEqual(series["buckets"], {"0.1": 1, "1": 2})
+        self.assertEqual((series["count"], series["sum"]), (3, 3.55))
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_dummy", STRIPE_HTTP_POOL_SIZE=4, STRIPE_READ_TIMEOUT=7)
+    def test_client_is_shared_and_pooled(self):
+        client = get_stripe_client()
+        self.assertIs(get_stripe_client(), client)
+        http_client = client._requestor._client
+        self.assertEqual(http_client._timeout, (settings.STRIPE_CONNECT_TIMEOUT, 7))
+        self.assertEqual(http_client._session.get_adapter("https://api.stripe.com")._pool_maxsize, 4)
+
+    def test_latency_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get("/api/payments/stripe-latency/").status_code, 401)
+        admin = User.objects.create_superuser("admin", "admin@example.com", "motdepasse")
+        client = APIClient()
+        client.force_authenticate(admin)
+        self.assertIn("endpoints", client.get("/api/payments/stripe-latency/").json())
+
+
+class WebhookClaimTests(TestCase):
+    """Several worker processes share the inbox: claims never overlap and expire with their lease."""
+
+    def setUp(self):
+        for n in range(5):
+            store_event({"id": f"evt_{n}", "type": "customer.created", "data": {"object": {}}})
+
+    def test_claims_do_not_overlap(self):
+        first = claim_events(batch_size=3)
+        second = claim_events(batch_size=3)
+        self.assertEqual([e.event_id for e in first], ["evt_0", "evt_1", "evt_2"])
+        self.assertEqual([e.event_id for e in second], ["evt_3", "evt_4"])
+        self.assertEqual(claim_events(batch_size=3), [])
+        self.assertEqual(
+            set(WebhookEvent.objects.values_list("status", "attempts")), {(WebhookEvent.PROCESSING, 1)}
+        )
+
+    def test_stale_claim_is_taken_again(self):
+        claimed = claim_events(batch_size=1)
+        now = timezone.now()
+        # Still leased: the other events only
+        self.assertNotIn(claimed[0].pk, [e.pk for e in claim_events(now=now + timedelta(minutes=1))])
+        # The worker holding it died: claimed again after the lease
+        again = claim_events(now=now + PROCESSING_LEASE + timedelta(seconds=1))
+        self.assertEqual([(e.pk, e.attempts) for e in again], [(claimed[0].pk, 2)])
+
+    def test_worker_drains_inbox_in_batches(self):
+        self.assertEqual(process_webhook_events(batch_size=2), (5, 0))
+        self.assertEqual(set(WebhookEvent.objects.values_list("status", flat=True)), {WebhookEvent.PROCESSED})
+        self.assertEqual(process_webhook_events(batch_size=2), (0, 0))
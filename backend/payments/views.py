@@ -1,62 +1,29 @@
 import stripe
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.core.mail import send_mail
+from django.utils import timezone
+import json
 import logging
+from datetime import timedelta
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from orders.models import Order, OrderItem
+from orders.models import DEFAULT_CURRENCY, Order, OrderItem
+from .fulfillment import fulfill_paid_order
+from . import stripe_client
+from .reservations import (
+    InsufficientStock,
+    create_reserved_order,
+    release_expired_reservations,
+    release_order_reservations,
+)
+from .webhooks import apply_event_now, store_event
 from catalog.models import Product
 
 logger = logging.getLogger('payments.webhook')
 
 
-def _fulfill_paid_order(order: Order, payment_intent_id: str | None):
-    """
-    Mark order as paid (idempotent), decrement stock, and send email.
-    """
-    if order.status == "paid":
-        return
-
-    order.status = "paid"
-    order.stripe_payment_intent_id = payment_intent_id
-    order.save()
-    logger.info("Order %s marked as paid (payment_intent=%s)", order.id, payment_intent_id)
-
-    # Decrement stock with logging
-    for item in order.items.all():
-        product = item.product
-        old_stock = product.stock
-        new_stock = max(0, old_stock - item.quantity)
-        product.stock = new_stock
-        product.save()
-        logger.info(
-            "Decremented stock for product %s (%s): %s -> %s",
-            product.id,
-            product.name,
-            old_stock,
-            new_stock,
-        )
-
-    # Send confirmation email (console backend in dev)
-    try:
-        send_mail(
-            subject=f"Commande #{order.id} confirmée",
-            message=(
-                f"Merci pour votre commande #{order.id}.\n\n"
-                f"Montant: {order.total_amount} €\n\n"
-                "Nous préparons votre livraison."
-            ),
-            from_email=getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@example.com"),
-            recipient_list=[order.user.email],
-        )
-        logger.info("Confirmation email sent for order %s to %s", order.id, order.user.email)
-    except Exception:
-        logger.exception("Failed to send confirmation email for order %s", order.id)
-
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_checkout_session(request):
@@ -76,7 +43,6 @@ def create_checkout_session(request):
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        stripe.api_key = stripe_secret
 
         items_data = request.data.get('items', [])
         
@@ -86,39 +52,44 @@ def create_checkout_session(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Load every product of the cart in one query
+        product_ids = []
+        for item_data in items_data:
+            try:
+                product_ids.append(int(item_data.get('id')))
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': f"Product {item_data.get('id')} not found"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        # Expired holds on these products no longer block this checkout
+        release_expired_reservations(product_ids)
+        products = Product.objects.in_bulk(product_ids)
+
         # Calculate total and create line items for Stripe
         total_amount = 0
         line_items = []
         order_items = []
 
-        for item_data in items_data:
-            product_id = item_data.get('id')
+        for product_id, item_data in zip(product_ids, items_data):
             quantity = item_data.get('quantity', 1)
             price = item_data.get('price')
 
-            # Fetch product from DB to validate
-            try:
-                product = Product.objects.get(id=product_id)
-            except Product.DoesNotExist:
+            # Validate against the DB
+            product = products.get(product_id)
+            if product is None:
                 return Response(
                     {'error': f'Product {product_id} not found'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Check stock
-            if product.stock < quantity:
-                return Response(
-                    {'error': f'Insufficient stock for {product.name}'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
             item_total = price * quantity
             total_amount += item_total
 
             # Prepare for Stripe
             line_items.append({
                 'price_data': {
-                    'currency': 'eur',
+                    'currency': DEFAULT_CURRENCY,
                     'product_data': {
                         'name': product.name,
                         'description': product.description,
@@ -128,30 +99,21 @@ def create_checkout_session(request):
                 'quantity': quantity,
             })
 
-            order_items.append({
-                'product': product,
-                'quantity': quantity,
-                'price': price,
-            })
+            order_items.append(OrderItem(product=product, quantity=quantity, price=price))
 
-        # Create Order in DB
-        order = Order.objects.create(
-            user=request.user,
-            total_amount=total_amount,
-            status='pending'
-        )
+        # Create Order (with its list summary) and OrderItems, and reserve their stock
+        try:
+            order, reserved_until = create_reserved_order(
+                request.user, order_items, total_amount, DEFAULT_CURRENCY
+            )
+        except InsufficientStock as e:
+            return Response(
+                {'error': f'Insufficient stock for {e.product.name}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         logger.info("Created Order %s for user %s (pending) total=%s", order.id, request.user.email, total_amount)
 
-        # Create OrderItems
-        for item_info in order_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item_info['product'],
-                quantity=item_info['quantity'],
-                price=item_info['price'],
-            )
-
         frontend_url = getattr(settings, "FRONTEND_URL", "http://127.0.0.1:3000").rstrip("/")
         default_success_url = f"{frontend_url}/success?order_id={order.id}&session_id={{CHECKOUT_SESSION_ID}}"
         default_cancel_url = f"{frontend_url}/cart"
@@ -163,20 +125,29 @@ def create_checkout_session(request):
             success_url = request.query_params.get("success_url") or default_success_url
         cancel_url = request.query_params.get("cancel_url") or default_cancel_url
 
-        # Create Stripe Checkout Session
-        session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=line_items,
-            mode='payment',
-            success_url=success_url,
-            cancel_url=cancel_url,
-            customer_email=request.user.email,
-            metadata={'order_id': order.id},
-        )
+        # Create Stripe Checkout Session; it cannot be paid after the reservation
+        # expires (Stripe accepts expiries 30 minutes to 24 hours away)
+        expires_at = max(reserved_until, timezone.now() + timedelta(minutes=30, seconds=5))
+        try:
+            session = stripe_client.create_checkout(
+                {
+                    'payment_method_types': ['card'],
+                    'line_items': line_items,
+                    'mode': 'payment',
+                    'success_url': success_url,
+                    'cancel_url': cancel_url,
+                    'customer_email': request.user.email,
+                    'metadata': {'order_id': order.id},
+                    'expires_at': int(expires_at.timestamp()),
+                },
+                idempotency_key=f'checkout-order-{order.id}',
+            )
+        except Exception:
+            release_order_reservations(order)
+            raise
 
         # Store session ID in order
-        order.stripe_session_id = session.id
-        order.save()
+        Order.objects.filter(pk=order.pk).update(stripe_session_id=session.id, updated_at=timezone.now())
 
         logger.info("Created Stripe session %s for order %s", session.id, order.id)
 
@@ -214,10 +185,9 @@ def confirm_checkout_session(request):
             {"error": "Stripe is not configured (missing STRIPE_SECRET_KEY)."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
-    stripe.api_key = settings.STRIPE_SECRET_KEY
 
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = stripe_client.retrieve_checkout(session_id)
     except stripe.error.StripeError as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -239,7 +209,7 @@ def confirm_checkout_session(request):
 
     # Only fulfill when Stripe says it's paid
     if payment_status == "paid":
-        _fulfill_paid_order(order, payment_intent_id)
+        fulfill_paid_order(order, payment_intent_id)
     else:
         logger.info(
             "confirm_checkout_session: session_id=%s order_id=%s payment_status=%s",
@@ -263,7 +233,7 @@ def confirm_checkout_session(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def stripe_webhook(request):
-    """Handle Stripe webhook events: mark order paid, decrement stock, send email."""
+    """Verify a Stripe webhook event and store it in the inbox (payments/webhooks.py)."""
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
     webhook_secret = getattr(settings, 'STRIPE_WEBHOOK_SECRET', '')
@@ -271,7 +241,6 @@ def stripe_webhook(request):
     if not getattr(settings, "STRIPE_SECRET_KEY", ""):
         logger.error("Stripe webhook called but STRIPE_SECRET_KEY is missing")
         return Response(status=500)
-    stripe.api_key = settings.STRIPE_SECRET_KEY
 
     # In production, require a signed webhook
     if not getattr(settings, "DEBUG", True) and not webhook_secret:
@@ -285,10 +254,10 @@ def stripe_webhook(request):
 
     try:
         if webhook_secret:
-            event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
+            event = stripe_client.construct_event(payload, sig_header, webhook_secret)
         else:
             # Fallback for testing without a webhook secret (less secure)
-            event = stripe.Event.construct_from(request.data, stripe.api_key)
+            event = stripe.Event.construct_from(request.data, settings.STRIPE_SECRET_KEY)
     except ValueError as e:
         logger.error('Invalid payload for Stripe webhook: %s', e)
         return Response(status=400)
@@ -297,36 +266,29 @@ def stripe_webhook(request):
         return Response(status=400)
 
     logger.info('Stripe event received: id=%s type=%s', event.get('id'), event.get('type'))
+    if not event.get('id') or not event.get('type'):
+        logger.error('Stripe event without id or type')
+        return Response(status=400)
 
-    # Handle the checkout session completed event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        metadata = session.get('metadata', {}) or {}
-        order_id = metadata.get('order_id')
-        payment_intent = session.get('payment_intent')
-
-        logger.info('Processing checkout.session.completed: session_id=%s order_id=%s payment_intent=%s',
-                    session.get('id'), order_id, payment_intent)
-
-        if order_id:
-            try:
-                order = Order.objects.get(id=order_id)
-            except Order.DoesNotExist:
-                logger.warning('Order %s not found for webhook session %s', order_id, session.get('id'))
-                return Response(status=200)
-
-            logger.debug('Order %s current status=%s', order.id, order.status)
-
-            if order.status == 'paid':
-                logger.info('Order %s already marked as paid; ignoring duplicate webhook', order.id)
-                return Response(status=200)
+    stored = store_event(json.loads(payload))
+    if settings.WEBHOOK_WORKER:
+        # Acknowledge right away: the process_webhook_events worker applies it
+        if not stored:
+            logger.info('Stripe event %s already received; ignoring redelivery', event.get('id'))
+        return Response(status=200)
+    # Single-process setup: apply it now, or again on a redelivery after a failure;
+    # nothing else retries it, so a failure is reported to Stripe
+    if not apply_event_now(event['id']):
+        return Response(status=500)
+    return Response(status=200)
 
-            try:
-                _fulfill_paid_order(order, payment_intent)
-            except Exception:
-                logger.exception('Failed processing order %s in webhook', order.id)
 
-    else:
-        logger.debug('Unhandled Stripe event type: %s', event['type'])
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def stripe_latency(request):
+    """Latency histogram of the Stripe API calls made by this worker process since it started."""
+    return Response({
+        "buckets": [str(bound) for bound in stripe_client.stripe_latency.buckets],
+        "endpoints": stripe_client.stripe_latency.snapshot(),
+    })
 
-    return Response(status=200)
@@ -0,0 +1,195 @@
+"""
+Stripe webhook inbox.
+
+The webhook view verifies an event and stores it (`store_event`): the unique
+Stripe event id drops redeliveries. With WEBHOOK_WORKER on, Stripe gets its
+200 at once instead of waiting for fulfillment, and the
+`process_webhook_events` worker claims due events in batches and applies them;
+otherwise the view applies the event itself (`apply_event_now`), as a single
+process does not need a shared cache or broker, and answers a failure with an
+error so that Stripe redelivers the event. The worker retries a failed event
+with exponential backoff; either way it is dead-lettered after
+WEBHOOK_MAX_ATTEMPTS. Handlers are idempotent, so replaying one is safe.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from orders.models import Order
+
+from .fulfillment import fulfill_paid_order
+from .models import WebhookEvent
+from .reservations import release_order_reservations
+
+logger = logging.getLogger('payments.webhook')
+
+DEFAULT_BATCH_SIZE = 50
+# An event claimed for longer than this (worker killed mid-batch) is claimed again
+PROCESSING_LEASE = timedelta(minutes=10)
+
+
+def store_event(event: dict) -> bool:
+    """Add a verified Stripe event to the inbox; False when it was already received."""
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(event_id=event['id'], type=event['type'], payload=event)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _checkout_completed(session):
+    order_id = (session.get('metadata', {}) or {}).get('order_id')
+    payment_intent = session.get('payment_intent')
+    logger.info('Processing checkout.session.completed: session_id=%s order_id=%s payment_intent=%s',
+                session.get('id'), order_id, payment_intent)
+    if not order_id:
+        return
+    order = Order.objects.filter(id=order_id).first()
+    if order is None:
+        logger.warning('Order %s not found for webhook session %s', order_id, session.get('id'))
+        return
+    if order.status == 'paid':
+        logger.info('Order %s already marked as paid; ignoring duplicate webhook', order.id)
+        return
+    fulfill_paid_order(order, payment_intent)
+
+
+def _checkout_expired(session):
+    # Abandoned checkout: give the reserved stock back
+    order_id = (session.get('metadata', {}) or {}).get('order_id')
+    order = Order.objects.filter(id=order_id, status='pending').first() if order_id else None
+    if order is not None:
+        released = release_order_reservations(order)
+        logger.info('Checkout session %s expired: order %s cancelled, %s reservations released',
+                    session.get('id'), order.id, released)
+
+
+HANDLERS = {
+    'checkout.session.completed': _checkout_completed,
+    'checkout.session.expired': _checkout_expired,
+}
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt, after `attempts` failed ones."""
+    seconds = settings.WEBHOOK_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.WEBHOOK_RETRY_MAX_DELAY))
+
+
+def claim_events(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Claim up to `batch_size` due events for this worker. Each one leaves
+    `pending` through a conditional update, so concurrent workers never get
+    the same event.
+    """
+    now = now or timezone.now()
+    WebhookEvent.objects.filter(status=WebhookEvent.PROCESSING, claimed_at__lt=now - PROCESSING_LEASE).update(
+        status=WebhookEvent.PENDING
+    )
+    due = list(
+        WebhookEvent.objects.filter(status=WebhookEvent.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    claimed = [
+        pk
+        for pk in due
+        if WebhookEvent.objects.filter(pk=pk, status=WebhookEvent.PENDING).update(
+            status=WebhookEvent.PROCESSING, claimed_at=now, attempts=F('attempts') + 1
+        )
+    ]
+    return list(WebhookEvent.objects.filter(pk__in=claimed).order_by('created_at', 'pk'))
+
+
+def apply_event_now(event_id: str) -> bool:
+    """
+    Claim and apply one stored event in the current process (WEBHOOK_WORKER
+    off). False only when it failed: an event that is already processed,
+    being processed or dead-lettered is left alone.
+    """
+    claimed = WebhookEvent.objects.filter(event_id=event_id, status=WebhookEvent.PENDING).update(
+        status=WebhookEvent.PROCESSING, claimed_at=timezone.now(), attempts=F('attempts') + 1
+    )
+    return not claimed or process_event(WebhookEvent.objects.get(event_id=event_id))
+
+
+def process_event(event: WebhookEvent) -> bool:
+    """Apply a claimed event; on failure schedule a retry or dead-letter it. Returns success."""
+    handler = HANDLERS.get(event.type)
+    try:
+        if handler is None:
+            logger.debug('Unhandled Stripe event type: %s', event.type)
+        else:
+            handler(event.payload['data']['object'])
+    except Exception as exc:
+        now = timezone.now()
+        if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            status, next_attempt_at = WebhookEvent.DEAD, now
+            logger.exception('Stripe event %s dead-lettered after %s attempts', event.event_id, event.attempts)
+        else:
+            status, next_attempt_at = WebhookEvent.PENDING, now + retry_delay(event.attempts)
+            logger.warning('Stripe event %s failed (attempt %s), retrying at %s',
+                           event.event_id, event.attempts, next_attempt_at, exc_info=True)
+        WebhookEvent.objects.filter(pk=event.pk).update(
+            status=status, next_attempt_at=next_attempt_at, claimed_at=None, last_error=f'{type(exc).__name__}: {exc}'
+        )
+        return False
+
+    WebhookEvent.objects.filter(pk=event.pk).update(
+        status=WebhookEvent.PROCESSED, processed_at=timezone.now(), claimed_at=None, last_error=''
+    )
+    return True
+
+
+def process_webhook_events(batch_size=DEFAULT_BATCH_SIZE):
+    """Apply every due event, batch after batch; returns (processed, failed)."""
+    processed = failed = 0
+    while events := claim_events(batch_size):
+        for event in events:
+            if process_event(event):
+                processed += 1
+            else:
+                failed += 1
+    return processed, failed
+
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def ensure_shared_backends() -> None:
+    """
+    Events applied by the worker invalidate the catalog cache and publish
+    order status updates: both must reach the web processes. Raise
+    ImproperlyConfigured when the default cache or ORDER_EVENTS_BROKER only
+    lives in the current process, or when the broker needs another database.
+    """
+    problems = []
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        problems.append(f"the default cache ({settings.CACHES['default']['BACKEND']}) is process-local, "
+                        "use a shared backend (Redis, Memcached)")
+    broker = import_string(settings.ORDER_EVENTS_BROKER)
+    if getattr(broker, 'process_local', False):
+        problems.append(f"ORDER_EVENTS_BROKER ({settings.ORDER_EVENTS_BROKER}) is process-local, "
+                        "use orders.events.PostgresBroker or another shared broker")
+    elif getattr(broker, 'database_vendor', connection.vendor) != connection.vendor:
+        problems.append(f"ORDER_EVENTS_BROKER ({settings.ORDER_EVENTS_BROKER}) needs {broker.database_vendor}, "
+                        f"the default database is {connection.vendor}")
+    if problems:
+        raise ImproperlyConfigured('The webhook worker needs shared backends: ' + '; '.join(problems) + '.')
+
+
+def requeue_events(events) -> int:
+    """Give dead-lettered (or failing) `events` a fresh set of attempts, due now."""
+    return events.filter(status__in=(WebhookEvent.PENDING, WebhookEvent.DEAD)).update(
+        status=WebhookEvent.PENDING, attempts=0, next_attempt_at=timezone.now(), claimed_at=None
+    )
@@ -19,10 +19,20 @@ type Order = {
   id: number;
   status: string;
   total_amount: string;
+  currency: string;
+  item_count: number;
+  first_item_name: string;
+  first_item_image_url: string;
   created_at: string;
-  items: OrderItem[];
 };
 
+type OrderPage = {
+  next: string | null;
+  results: Order[];
+};
+
+const PAGE_SIZE = 20;
+
 const STATUS_LABELS: Record<string, string> = {
   pending: "En attente de paiement",
   paid: "Payé",
@@ -34,6 +44,10 @@ export default function OrdersPage() {
   const [orders, setOrders] = useState<Order[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Le détail des articles n'est chargé qu'à la demande (GET /orders/<id>/)
+  const [openItems, setOpenItems] = useState<Record<number, OrderItem[] | null>>({});
 
   const user = useAuthStore((s) => s.user);
   const isHydrated = useAuthStore((s) => s.isHydrated);
@@ -48,13 +62,13 @@ export default function OrdersPage() {
 
     async function fetchOrders() {
       try {
-        const res = await api.get("/orders/");
-        if (!res.ok) {
+        const page = await fetchOrderPage(null);
+        if (!page) {
           setError("Impossible de charger les commandes.");
           return;
         }
-        const data = await res.json();
-        setOrders(data);
+        setOrders(page.results);
+        setNextCursor(cursorFrom(page.next));
       } catch {
         setError("Une erreur est survenue.");
       } finally {
@@ -65,6 +79,41 @@ export default function OrdersPage() {
     fetchOrders();
   }, [isHydrated, user, router]);
 
+  async function loadMore() {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchOrderPage(nextCursor);
+      if (!page) {
+        setError("Impossible de charger les commandes.");
+        return;
+      }
+      setOrders((current) => [...current, ...page.results]);
+      setNextCursor(cursorFrom(page.next));
+    } catch {
+      setError("Une erreur est survenue.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
+  async function toggleItems(orderId: number) {
+    if (orderId in openItems) {
+      setOpenItems((current) => withoutKey(current, orderId));
+      return;
+    }
+    setOpenItems((current) => ({ ...current, [orderId]: null }));
+    try {
+      const res = await api.get(`/orders/${orderId}/`);
+      if (!res.ok) throw new Error();
+      const data: { items: OrderItem[] } = await res.json();
+      setOpenItems((current) => ({ ...current, [orderId]: data.items }));
+    } catch {
+      setOpenItems((current) => withoutKey(current, orderId));
+      setError("Impossible de charger le détail de la commande.");
+    }
+  }
+
   if (!isHydrated || !user) return null;
 
   return (
@@ -117,14 +166,44 @@ export default function OrdersPage() {
                   })}
                 </span>
               </div>
-              <ul className="flex flex-col gap-1.5 text-sm text-slate-600">
-                {order.items.map((item) => (
-                  <li key={item.id} className="flex justify-between">
-                    <span>{item.product_name} × {item.quantity}</span>
-                    <span>{(Number(item.price) * item.quantity).toFixed(2)} €</span>
-                  </li>
-                ))}
-              </ul>
+              <div className="flex items-center gap-4">
+                <div className="h-14 w-14 shrink-0 overflow-hidden rounded-lg border border-white/60 bg-white/40">
+                  {order.first_item_image_url ? (
+                    // eslint-disable-next-line @next/next/no-img-element
+                    <img
+                      src={order.first_item_image_url}
+                      alt={order.first_item_name}
+                      className="h-full w-full object-cover"
+                      loading="lazy"
+                    />
+                  ) : (
+                    <Package className="m-auto h-full w-6 text-slate-300" />
+                  )}
+                </div>
+                <div className="flex flex-1 flex-col gap-0.5 text-sm">
+                  <span className="font-medium text-slate-800">{order.first_item_name}</span>
+                  <span className="text-slate-500">
+                    {order.item_count} article{order.item_count > 1 ? "s" : ""}
+                  </span>
+                </div>
+                <Button variant="ghost" size="sm" onClick={() => toggleItems(order.id)}>
+                  {order.id in openItems ? "Masquer" : "Détail"}
+                </Button>
+              </div>
+              {order.id in openItems && (
+                <ul className="flex flex-col gap-1.5 text-sm text-slate-600">
+                  {openItems[order.id] === null ? (
+                    <li className="text-slate-500">Chargement...</li>
+                  ) : (
+                    openItems[order.id]!.map((item) => (
+                      <li key={item.id} className="flex justify-between">
+                        <span>{item.product_name} × {item.quantity}</span>
+                        <span>{(Number(item.price) * item.quantity).toFixed(2)} €</span>
+                      </li>
+                    ))
+                  )}
+                </ul>
+              )}
               <div className="flex justify-between border-t border-white/50 pt-4 text-sm">
                 <span className="font-medium text-slate-700">Total</span>
                 <span className="font-bold text-amber-600">
@@ -133,8 +212,32 @@ export default function OrdersPage() {
               </div>
             </article>
           ))}
+          {nextCursor && (
+            <Button variant="secondary" onClick={loadMore} disabled={loadingMore} className="self-center">
+              {loadingMore ? "Chargement..." : "Voir plus de commandes"}
+            </Button>
+          )}
         </div>
       )}
     </div>
   );
 }
+
+/** Une page d'historique (pagination par curseur côté API : `?limit=` puis `cursor`). */
+async function fetchOrderPage(cursor: string | null): Promise<OrderPage | null> {
+  const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+  if (cursor) params.set("cursor", cursor);
+  const res = await api.get(`/orders/?${params}`);
+  if (!res.ok) return null;
+  return res.json();
+}
+
+function cursorFrom(next: string | null): string | null {
+  return next ? new URL(next).searchParams.get("cursor") : null;
+}
+
+function withoutKey<T>(record: Record<number, T>, key: number): Record<number, T> {
+  const next = { ...record };
+  delete next[key];
+  return next;
+}
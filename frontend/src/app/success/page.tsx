@@ -3,7 +3,7 @@
 import { useEffect, useMemo, useState } from "react";
 import { useRouter, useSearchParams } from "next/navigation";
 import Link from "next/link";
-import { api } from "@/lib/api-client";
+import { api, apiUrl } from "@/lib/api-client";
 import { useAuthStore } from "@/store/auth-store";
 import { useCartStore } from "@/store/cart-store";
 import { Button } from "@/components/ui/button";
@@ -74,6 +74,12 @@ export default function SuccessPage() {
     }
 
     let cancelled = false;
+    let closeStream: (() => void) | null = null;
+    let pollTimer: ReturnType<typeof setTimeout> | null = null;
+    // Relecture de secours : 3 s puis doublement jusqu'à 30 s, 8 essais au plus
+    const pollBaseDelay = 3000;
+    const pollMaxDelay = 30000;
+    const pollMaxTries = 8;
     let tries = 0;
     const maxTries = 20;
     const publicRetries = 3;
@@ -94,23 +100,65 @@ export default function SuccessPage() {
               if (data.status === "paid") clearCart();
               setLoading(false);
               if (data.status === "pending") {
+                let settled = false;
+                const settle = (status: string) => {
+                  if (cancelled || settled) return;
+                  if (status !== "pending") settled = true;
+                  setOrder((current) => (current ? { ...current, status } : current));
+                  if (status === "paid") clearCart();
+                  if (settled) closeStream?.();
+                };
+                // Filet de sécurité : si le flux SSE tombe (proxy qui coupe le flux,
+                // serveur WSGI...), on relit la commande, de moins en moins souvent.
+                // Chaque relecture interroge Stripe : jamais tant que le flux est ouvert.
+                let polling = false;
+                let pollTries = 0;
                 const poll = async () => {
-                  if (cancelled) return;
+                  if (cancelled || settled) return;
+                  pollTries += 1;
                   try {
                     const r = await api.get(
                       `/orders/by-checkout-session/?session_id=${encodeURIComponent(sessionId)}`,
                       { requiresAuth: false }
                     );
-                    if (cancelled || !r.ok) return;
-                    const d = (await r.json()) as Order;
-                    setOrder(d);
-                    if (d.status === "paid") clearCart();
-                    if (d.status === "pending" && !cancelled) setTimeout(poll, 2000);
+                    if (r.ok) settle(((await r.json()) as Order).status);
                   } catch {
                     // ignore
                   }
+                  if (!cancelled && !settled && pollTries < pollMaxTries) {
+                    pollTimer = setTimeout(poll, Math.min(pollBaseDelay * 2 ** pollTries, pollMaxDelay));
+                  }
+                };
+                const fallBackToPolling = () => {
+                  closeStream?.();
+                  if (polling || cancelled || settled) return;
+                  polling = true;
+                  pollTimer = setTimeout(poll, pollBaseDelay);
                 };
-                setTimeout(poll, 2000);
+                // Le serveur pousse le changement de statut (SSE) dès qu'il a lieu
+                let stream: EventSource;
+                try {
+                  stream = new EventSource(
+                    await apiUrl(
+                      `/orders/${data.id}/events/?session_id=${encodeURIComponent(sessionId)}`
+                    )
+                  );
+                } catch {
+                  fallBackToPolling();
+                  return;
+                }
+                if (cancelled || settled) {
+                  stream.close();
+                  return;
+                }
+                closeStream = () => stream.close();
+                stream.addEventListener("status", (event) => {
+                  const { status } = JSON.parse((event as MessageEvent<string>).data) as {
+                    status: string;
+                  };
+                  settle(status);
+                });
+                stream.onerror = fallBackToPolling;
               }
               return;
             }
@@ -186,6 +234,8 @@ export default function SuccessPage() {
     run();
     return () => {
       cancelled = true;
+      closeStream?.();
+      if (pollTimer) clearTimeout(pollTimer);
     };
   }, [isHydrated, redirectChecked, user, router, orderId, sessionId, clearCart]);
 
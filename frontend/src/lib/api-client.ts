@@ -21,6 +21,11 @@ function getApiBaseUrl(): Promise<string> {
   return baseUrlPromise;
 }
 
+/** URL absolue d'un endpoint de l'API (ex. pour `EventSource`, qui ne passe pas par `apiClient`). */
+export async function apiUrl(endpoint: string): Promise<string> {
+  return `${await getApiBaseUrl()}${endpoint}`;
+}
+
 interface ApiRequestOptions extends RequestInit {
   requiresAuth?: boolean;
 }